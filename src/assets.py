@@ -0,0 +1,198 @@
+from collections import OrderedDict
+import os
+import weakref
+
+import pygame
+
+from settings import settings
+from tracing import tracer
+from atlas import texture_atlas, sorted_walk
+from prefetch import prefetcher
+
+
+class Assets:
+    """Cache of loaded images, sounds and fonts, shared by the whole game"""
+    def __init__(self):
+        """Initialize the cache"""
+        # Loaded assets by their keys
+        self.images = {}
+        self.folders = {}
+        # Sounds in the order they were last used, the oldest first
+        self.sounds = OrderedDict()
+        self.fonts = {}
+        # Copies of shared images with changed alpha
+        self.faded_images = {}
+
+        # Statistics of the cache
+        self.hits = 0
+        self.misses = 0
+        # Memory taken by the decoded images and sounds
+        self.bytes = 0
+        # Memory taken by each cached sound, and all of them together
+        self.sound_bytes = {}
+        self.sounds_bytes = 0
+        # Sounds dropped from the cache that something still plays, reused instead of decoded again
+        self.evicted_sounds = weakref.WeakValueDictionary()
+
+    def image(self, path, scale=1, flip=False):
+        """Get an image, optionally scaled and flipped horizontally"""
+        key = (self._full_path(path), scale, flip)
+        if self._cached(key, self.images):
+            return self.images[key]
+
+        with tracer.span("load image", path=path):
+            # Take the image from its atlas sheet, or load it if it isn't packed
+            surface = texture_atlas.frame(key[0])
+            packed = surface is not None
+            if not packed:
+                surface = prefetcher.load(key[0]).convert_alpha()
+            # Scale it if needed
+            if scale != 1:
+                surface = pygame.transform.scale(surface, (surface.get_width() * scale, surface.get_height() * scale))
+            # Flip it at X-Axis if needed
+            if flip:
+                surface = pygame.transform.flip(surface, True, False)
+
+        # Scaled or flipped copy doesn't use its sheet anymore
+        if packed and surface.get_parent() is None:
+            texture_atlas.release(key[0])
+
+        self.images[key] = surface
+        # Image that's a part of a sheet takes no memory of its own
+        if surface.get_parent() is None:
+            self.bytes += self._surface_bytes(surface)
+        return surface
+
+    def folder(self, path, scale=1, flip=False):
+        """Get all images from a directory, as a new list of shared images"""
+        key = (self._full_path(path), scale, flip)
+        # Return a new list, so the caller can change it without affecting the cache
+        return [self.image(image_path, scale, flip) for image_path in self._folder_paths(key)]
+
+    def prefetch(self, path, scale=1, flip=False):
+        """Start decoding images of the directory in the background, if they aren't loaded yet"""
+        key = (self._full_path(path), scale, flip)
+        files = []
+        for image_path in self._folder_paths(key):
+            if (image_path, scale, flip) not in self.images:
+                image_file = texture_atlas.file(image_path)
+                if image_file is not None and image_file not in files:
+                    files.append(image_file)
+        prefetcher.prefetch(files)
+
+    def release(self, path, scale=1, flip=False):
+        """Forget images of the directory, so their memory gets freed once nothing uses them"""
+        key = (self._full_path(path), scale, flip)
+        for image_path in self.folders.get(key, ()):
+            surface = self.images.pop((image_path, scale, flip), None)
+            if surface is None:
+                continue
+            # Image that's a part of a sheet lets the sheet go instead
+            if surface.get_parent() is None:
+                self.bytes -= self._surface_bytes(surface)
+            else:
+                texture_atlas.release(image_path)
+        self.trim()
+
+    def trim(self):
+        """Drop the atlas sheets that none of the cached images are a part of"""
+        texture_atlas.trim()
+
+    def sound(self, path, volume=1.0):
+        """Get a sound with given volume, keep the decoded sounds within their memory limit"""
+        key = (self._full_path(path), volume)
+        if self._cached(key, self.sounds):
+            self.sounds.move_to_end(key)
+            return self.sounds[key]
+
+        sound = self.evicted_sounds.pop(key, None)
+        if sound is None:
+            # Load the sound and set its volume
+            with tracer.span("load sound", path=path):
+                sound = prefetcher.load(key[0])
+            sound.set_volume(volume)
+
+        self.sounds[key] = sound
+        sound_bytes = self.sound_bytes[key] = self._sound_bytes(sound)
+        self.sounds_bytes += sound_bytes
+        self.bytes += sound_bytes
+        self._trim_sounds()
+        return sound
+
+    def font(self, path, size):
+        """Get a font with given size, pygame's default font for no path"""
+        key = (self._full_path(path) if path else None, size)
+        if not self._cached(key, self.fonts):
+            with tracer.span("load font", path=path):
+                self.fonts[key] = pygame.font.Font(key[0], size)
+        return self.fonts[key]
+
+    def faded(self, surface, alpha):
+        """Get a copy of the shared image with given alpha, never changing the shared one"""
+        # Fully opaque image is the shared one itself
+        if alpha == 255:
+            return surface
+
+        key = (surface, alpha)
+        if self._cached(key, self.faded_images):
+            return self.faded_images[key]
+
+        # Copy the image and change alpha of the copy only
+        faded_surface = surface.copy()
+        faded_surface.set_alpha(alpha)
+
+        self.faded_images[key] = faded_surface
+        self.bytes += self._surface_bytes(faded_surface)
+        return faded_surface
+
+    def _folder_paths(self, key):
+        """Get full paths of the directory's images"""
+        if not self._cached(key, self.folders):
+            # Find paths of the images only once, take them from the atlas if it has the folder
+            image_paths = texture_atlas.folder(key[0])
+            if image_paths is None:
+                # Go through each file that exists there, in sorted order, save the full path to it
+                image_paths = [os.path.join(dir_path, image) for dir_path, dirs, images in sorted_walk(key[0])
+                               for image in images]
+            self.folders[key] = image_paths
+        return self.folders[key]
+
+    def _trim_sounds(self):
+        """Drop the least recently used sounds from the cache, until they fit in their memory limit"""
+        # The newest sound stays, even if it's too large on its own
+        while self.sounds_bytes > settings.SOUND_CACHE_BYTES and len(self.sounds) > 1:
+            key, sound = self.sounds.popitem(last=False)
+            # Sound still held by the game lives on, and comes back without decoding
+            self.evicted_sounds[key] = sound
+            sound_bytes = self.sound_bytes.pop(key)
+            self.sounds_bytes -= sound_bytes
+            self.bytes -= sound_bytes
+
+    def _cached(self, key, cache):
+        """Check if the key is cached, count the hit or miss"""
+        if key in cache:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _full_path(self, path):
+        """Get normalized, absolute path to the asset"""
+        return os.path.normpath(os.path.join(settings.BASE_PATH, path))
+
+    def _surface_bytes(self, surface):
+        """Calculate memory taken by the surface's pixels"""
+        return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+    def _sound_bytes(self, sound):
+        """Calculate memory taken by the decoded sound"""
+        mixer_format = pygame.mixer.get_init()
+        # Mixer isn't running, nothing got decoded
+        if not mixer_format:
+            return 0
+
+        frequency, size, channels = mixer_format
+        return int(sound.get_length() * frequency) * channels * abs(size) // 8
+
+
+assets = Assets()
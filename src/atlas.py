@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+
+import pygame
+
+from settings import settings
+from sourcecache import SourceCache
+from tracing import tracer
+from prefetch import prefetcher
+
+
+logger = logging.getLogger(__name__)
+
+
+class TextureAtlas(SourceCache):
+    """Images of the graphics' folders packed into a few large sheets, with an index of their frames"""
+    description = "Texture atlas index"
+    fallback = "loading separate images"
+
+    def __init__(self):
+        """Initialize the atlas"""
+        # Folder with the sheets and their index
+        self.path = os.path.normpath(os.path.join(settings.BASE_PATH, settings.ATLAS_PATH))
+        self.index_path = os.path.join(self.path, "index.json")
+
+        # Sheet and rectangle of every frame, images of every folder, by their full paths. Loaded when first needed
+        self.frames = None
+        self.folders = None
+        # Loaded sheets, and memory they take
+        self.sheets = {}
+        self.bytes = 0
+        # Number of images taken from each sheet that are still used
+        self.users = {}
+
+    def load(self):
+        """Load the index, ignore it if it's missing, broken or any of the images changed since it was built"""
+        self.frames = {}
+        self.folders = {}
+        index = self._read(self.index_path, self._parse)
+        if index is None:
+            return
+
+        sources = self._stat_sources()
+        if not self._is_valid(index["sources"], sources):
+            logger.warning("Texture atlas is out of date, loading separate images. Build it again with atlas.py")
+            return
+        # Save new times of the images that were only touched
+        if self._is_touched(index["sources"], sources):
+            index["sources"] = sources
+            self._save(index)
+
+        self.frames = {self._full_path(path): (sheet, pygame.Rect(rect))
+                       for path, (sheet, rect) in index["frames"].items()}
+        self.folders = {self._full_path(path): [self._full_path(image) for image in images]
+                        for path, images in index["folders"].items()}
+
+    def frame(self, path):
+        """Get the image as a part of its sheet, None if it isn't in the atlas"""
+        if self.frames is None:
+            self.load()
+
+        frame = self.frames.get(path)
+        if frame is None:
+            return None
+        sheet, rect = frame
+        self.users[sheet] = self.users.get(sheet, 0) + 1
+        return self.sheet(sheet).subsurface(rect)
+
+    def release(self, path):
+        """Stop using the image taken from its sheet, the sheet can be trimmed once none of its images are used"""
+        self.users[self.frames[path][0]] -= 1
+
+    def trim(self):
+        """Drop the loaded sheets none of whose images are used, so their memory gets freed"""
+        for name in [name for name in self.sheets if not self.users.get(name)]:
+            sheet = self.sheets.pop(name)
+            self.bytes -= sheet.get_bytesize() * sheet.get_width() * sheet.get_height()
+
+    def file(self, path):
+        """Get the file the image still has to be decoded from, its sheet if it's packed, None if it's loaded"""
+        if self.frames is None:
+            self.load()
+
+        frame = self.frames.get(path)
+        if frame is None:
+            return path
+        sheet = frame[0]
+        return None if sheet in self.sheets else os.path.join(self.path, sheet)
+
+    def folder(self, path):
+        """Get paths of the folder's images in their order, None if it isn't in the atlas"""
+        if self.folders is None:
+            self.load()
+        return self.folders.get(path)
+
+    def build(self):
+        """Pack the images of every category into sheets, save them with the index"""
+        os.makedirs(self.path, exist_ok=True)
+        frames = {}
+        folders = {}
+
+        for category, category_path in settings.ATLAS_CATEGORIES.items():
+            category_path = self._full_path(category_path)
+            images = walk_images(category_path)
+
+            # List images of the category's every folder
+            for dir_path, dirs, files in sorted_walk(category_path):
+                folders[self._relative_path(dir_path)] = [self._relative_path(image) for image in walk_images(dir_path)]
+
+            # Pack the images and draw them onto their sheets
+            surfaces = [pygame.image.load(image) for image in images]
+            placements, sheet_sizes = self._pack([surface.get_size() for surface in surfaces])
+            sheets = [pygame.Surface(size, pygame.SRCALPHA) for size in sheet_sizes]
+            for image, surface, (sheet_index, pos_x, pos_y) in zip(images, surfaces, placements):
+                sheets[sheet_index].blit(surface, (pos_x, pos_y))
+                sheet = f"{category}_{sheet_index}.png"
+                frames[self._relative_path(image)] = (sheet, [pos_x, pos_y, surface.get_width(), surface.get_height()])
+
+            for sheet_index, sheet in enumerate(sheets):
+                pygame.image.save(sheet, os.path.join(self.path, f"{category}_{sheet_index}.png"))
+            logger.info("Packed %d images of %s into %d sheets", len(images), category, len(sheets))
+
+        # Store hashes of the sources, to recognize them later
+        sources = self._stat_sources()
+        self._hash_sources(sources)
+        index = {"sources": sources, "frames": frames, "folders": folders}
+        self._save(index)
+
+        # Use the new atlas
+        self.frames = None
+        self.folders = None
+        self.sheets = {}
+        self.bytes = 0
+        self.users = {}
+        return index
+
+    def _pack(self, sizes):
+        """Place rectangles of given sizes onto sheets in shelves, tallest first, return places and sheet sizes"""
+        sheet_size = settings.ATLAS_SHEET_SIZE
+        placements = [None] * len(sizes)
+        sheet_sizes = []
+
+        # Position in the current shelf, its height, and used size of the current sheet
+        pos_x = pos_y = shelf_height = 0
+        sheet_width = sheet_height = 0
+        order = sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], index))
+        for index in order:
+            width, height = sizes[index]
+            # Start a new shelf when this one is full
+            if pos_x and pos_x + width > sheet_size:
+                pos_x = 0
+                pos_y += shelf_height
+                shelf_height = 0
+            # Start a new sheet when this one is full
+            if pos_y and pos_y + height > sheet_size:
+                sheet_sizes.append((sheet_width, sheet_height))
+                pos_x = pos_y = shelf_height = 0
+                sheet_width = sheet_height = 0
+
+            placements[index] = (len(sheet_sizes), pos_x, pos_y)
+            pos_x += width
+            shelf_height = max(shelf_height, height)
+            sheet_width = max(sheet_width, pos_x)
+            sheet_height = max(sheet_height, pos_y + height)
+
+        if sizes:
+            sheet_sizes.append((sheet_width, sheet_height))
+        return placements, sheet_sizes
+
+    def sheet(self, name):
+        """Get the sheet, load it if needed"""
+        sheet = self.sheets.get(name)
+        if sheet is None:
+            with tracer.span("load atlas sheet", path=name):
+                sheet = self.sheets[name] = prefetcher.load(os.path.join(self.path, name)).convert_alpha()
+            self.bytes += sheet.get_bytesize() * sheet.get_width() * sheet.get_height()
+        return sheet
+
+    def _source_paths(self):
+        """Get paths of every image of the categories"""
+        return [self._relative_path(image) for category_path in settings.ATLAS_CATEGORIES.values()
+                for image in walk_images(self._full_path(category_path))]
+
+    def _parse(self, data):
+        """Parse the index, making sure it has all of its parts"""
+        index = json.loads(data)
+        for part in ("sources", "frames", "folders"):
+            if not isinstance(index[part], dict):
+                raise ValueError(f"Index has no {part}")
+        return index
+
+    def _save(self, index):
+        """Save the index file"""
+        self._write(self.index_path, lambda index_file: index_file.write(json.dumps(index).encode()))
+
+    def _relative_path(self, path):
+        """Get path relative to the game's files, the same on every system"""
+        return os.path.relpath(path, settings.BASE_PATH).replace(os.sep, "/")
+
+
+def sorted_walk(path):
+    """Walk through the directory like os.walk, with directories and files in sorted order"""
+    for dir_path, dirs, files in os.walk(path):
+        dirs.sort()
+        yield dir_path, dirs, sorted(files)
+
+
+def walk_images(path):
+    """Get full paths of the PNG images in the directory and below it, in sorted order"""
+    return [os.path.join(dir_path, file) for dir_path, dirs, files in sorted_walk(path)
+            for file in files if file.lower().endswith(".png")]
+
+
+texture_atlas = TextureAtlas()
+
+
+# If file is main, build the atlas
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    texture_atlas.build()
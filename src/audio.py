@@ -0,0 +1,170 @@
+from itertools import count
+import math
+import os
+
+import pygame
+
+from settings import settings
+from tracing import tracer
+
+
+class VoiceManager:
+    """Player of every sound effect, with fixed channels for each category of sounds, shared by the whole game"""
+    def __init__(self):
+        """Initialize the voice manager"""
+        # Channels of each category, set up once the mixer is running
+        self.channels = None
+        # Priority of the voice last played on each channel, and the order the voices started in
+        self.voices = {}
+        self.counter = count()
+
+        # Area around the listener heard at full volume, the size of the screen
+        self.listener = pygame.Rect(0, 0, settings.WIDTH, settings.HEIGHT)
+        self.listening = False
+        # Number of the current frame, and the frame each sound was last played in
+        self.frame = 0
+        self.last_played = {}
+
+        # Played voices, and dropped ones by the reason
+        self.played = 0
+        self.dropped = {"duplicate": 0, "distant": 0, "busy": 0, "preempted": 0}
+
+    def listen(self, pos):
+        """Move the listener to the position, at the start of a frame"""
+        self.frame += 1
+        self.listener.center = pos
+        self.listening = True
+
+    def play(self, sound, category, pos=None, loops=0, priority="normal"):
+        """Play the sound on a free channel of the category, or on a less important voice's one if there's none free.
+        Fade it by distance if it comes from the position"""
+        if not pygame.mixer.get_init():
+            return
+        if self.channels is None:
+            self._create_channels()
+
+        # The same sound played within the last few frames is heard already
+        last_frame = self.last_played.get(sound)
+        if last_frame is not None and self.frame - last_frame < settings.SOUND_DEDUPE_FRAMES:
+            self.dropped["duplicate"] += 1
+            return
+
+        # Sounds too far away from the screen can't be heard
+        volume = self._volume(pos)
+        if volume <= 0:
+            self.dropped["distant"] += 1
+            return
+
+        priority = settings.SOUND_PRIORITIES[priority]
+        channel = self._free_channel(category)
+        if channel is None:
+            # Take the channel of the least important voice, the oldest one of them, if this sound matters more
+            channel = min(self.channels[category], key=self.voices.__getitem__)
+            if self.voices[channel][0] >= priority:
+                self.dropped["busy"] += 1
+                return
+            channel.stop()
+            self.dropped["preempted"] += 1
+
+        channel.set_volume(volume)
+        channel.play(sound, loops)
+        self.voices[channel] = (priority, next(self.counter))
+        self.last_played[sound] = self.frame
+        self.played += 1
+
+    def _volume(self, pos):
+        """Get volume of the sound coming from the position, full one on the screen, fading out beyond it"""
+        if pos is None or not self.listening:
+            return 1
+
+        # Distance from the screen's edges
+        distance_x = max(self.listener.left - pos[0], 0, pos[0] - self.listener.right)
+        distance_y = max(self.listener.top - pos[1], 0, pos[1] - self.listener.bottom)
+        distance = math.hypot(distance_x, distance_y)
+        return max(0, 1 - distance / settings.SOUND_HEARING_DISTANCE)
+
+    def _free_channel(self, category):
+        """Get a channel of the category that isn't playing anything"""
+        for channel in self.channels[category]:
+            if not channel.get_busy():
+                return channel
+        return None
+
+    def _create_channels(self):
+        """Give every category its channels, reserved so nothing else plays on them"""
+        total = sum(settings.SOUND_CHANNELS.values())
+        pygame.mixer.set_num_channels(max(total, pygame.mixer.get_num_channels()))
+        pygame.mixer.set_reserved(total)
+
+        self.channels = {}
+        index = 0
+        for category, amount in settings.SOUND_CHANNELS.items():
+            self.channels[category] = [pygame.mixer.Channel(index + number) for number in range(amount)]
+            index += amount
+
+
+class MusicPlayer:
+    """Player of the background music, streamed from its files track by track instead of decoded at once"""
+    def __init__(self):
+        """Initialize the music player"""
+        # Full paths of the tracks playing in order, and index of the current one
+        self.playlist = []
+        self.index = 0
+        self.volume = 1
+        # Playlist waiting for the current track to fade out
+        self.next_playlist = None
+
+    def play(self, playlist, volume=settings.MUSIC_VOLUME):
+        """Play the tracks in order and over again, fading over from the music that plays now"""
+        if not pygame.mixer.get_init():
+            return
+        playlist = [os.path.normpath(os.path.join(settings.BASE_PATH, path)) for path in playlist]
+
+        # Let the current track fade out first, the new one fades in after it
+        if pygame.mixer.music.get_busy():
+            self.next_playlist = (playlist, volume)
+            pygame.mixer.music.fadeout(settings.MUSIC_CROSSFADE // 2)
+            return
+        self._start(playlist, volume)
+
+    def stop(self):
+        """Fade the music out, don't play anything after it"""
+        self.playlist = []
+        self.next_playlist = None
+        if pygame.mixer.get_init():
+            pygame.mixer.music.fadeout(settings.MUSIC_CROSSFADE // 2)
+
+    def update(self):
+        """Start the next track once the current one is over"""
+        if not pygame.mixer.get_init() or pygame.mixer.music.get_busy():
+            return
+
+        # The old music faded out, switch to the new playlist
+        if self.next_playlist is not None:
+            playlist, volume = self.next_playlist
+            self.next_playlist = None
+            self._start(playlist, volume)
+        elif self.playlist:
+            self.index = (self.index + 1) % len(self.playlist)
+            self._play_track()
+
+    def _start(self, playlist, volume):
+        """Start the playlist from its first track"""
+        self.playlist = playlist
+        self.index = 0
+        self.volume = volume
+        if playlist:
+            self._play_track()
+
+    def _play_track(self):
+        """Stream the current track, fading it in"""
+        with tracer.span("load music", path=self.playlist[self.index]):
+            pygame.mixer.music.load(self.playlist[self.index])
+        pygame.mixer.music.set_volume(self.volume)
+        # Single track loops by itself, without a gap between the repeats
+        loops = -1 if len(self.playlist) == 1 else 0
+        pygame.mixer.music.play(loops, fade_ms=settings.MUSIC_CROSSFADE // 2)
+
+
+voices = VoiceManager()
+music = MusicPlayer()
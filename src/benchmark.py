@@ -0,0 +1,254 @@
+import argparse
+import json
+import platform
+import statistics
+from time import perf_counter
+
+# Headless runner goes first, it sets the drivers up before pygame starts
+from headless import Headless
+
+import pygame
+
+from settings import settings
+
+
+class ScriptedKeys:
+    """Keyboard state following a script of (frames, keys) steps, repeated in a loop"""
+    def __init__(self, script=()):
+        """Initialize the keyboard"""
+        # Keys pressed in every frame of the script
+        self.frames = [keys for length, keys in script for frame in range(length)]
+        # Keys pressed at the moment
+        self.pressed = set()
+        # Number of the current frame
+        self.frame = 0
+
+    def __call__(self):
+        """Get state of the keyboard, like pygame.key.get_pressed does"""
+        return self
+
+    def __getitem__(self, key):
+        """Check if the key is pressed"""
+        return key in self.pressed
+
+    def advance(self):
+        """Move to the next frame of the script"""
+        if self.frames:
+            self.pressed = self.frames[self.frame % len(self.frames)]
+        self.frame += 1
+
+
+class Scenario:
+    """Scripted situation in the level that gets measured"""
+    def __init__(self, name, script=(), setup=None, before_frame=None):
+        """Initialize the scenario"""
+        self.name = name
+        # Keys pressed during the scenario
+        self.script = script
+        # Functions preparing the level, and changing it before every frame
+        self.setup = setup
+        self.before_frame = before_frame
+
+
+class Benchmark:
+    """Runner of the scenarios, timing every phase of the frame"""
+    # Methods measured separately, by (object's attribute of the level or None for the level, method's name)
+    PHASES = {
+        "draw": (None, "_draw"),
+        "update": (None, "_update"),
+        "world": ("world", "update"),
+        "enemy_update": ("visible_sprites", "enemy_update"),
+        "player_attack": (None, "_player_attack"),
+        "ui": ("ui", "display")
+    }
+
+    def __init__(self, frames=600, warmup=60, seed=0):
+        """Initialize the benchmark"""
+        # Measured frames, and frames run before measuring
+        self.frames = frames
+        self.warmup = warmup
+        # Seed of the level's random numbers generator
+        self.seed = seed
+
+        # Times of the measured phases, in milliseconds
+        self.timings = {}
+        # Whether the current frame is measured
+        self.measuring = False
+
+    def run(self, scenario):
+        """Run the scenario, return its results"""
+        keys = ScriptedKeys(scenario.script)
+        headless = Headless(self.seed, keys)
+        level = headless.level
+
+        if scenario.setup:
+            scenario.setup(level)
+        self._instrument(level)
+
+        self.timings = {phase: [] for phase in self.PHASES}
+        frame_times = []
+        for frame in range(self.warmup + self.frames):
+            self.measuring = frame >= self.warmup
+            keys.advance()
+            if scenario.before_frame:
+                scenario.before_frame(level)
+
+            start = perf_counter()
+            headless.step(draw=True)
+            if self.measuring:
+                frame_times.append((perf_counter() - start) * 1000)
+
+        return {
+            "frames": self.frames,
+            "frame": self._summary(frame_times),
+            "phases": {phase: self._summary(times) for phase, times in self.timings.items()},
+            "sprites": len(level.visible_sprites),
+            "enemies": len([sprite for sprite in level.damageable_sprites if sprite.sprite_type == "enemy"])
+        }
+
+    def _instrument(self, level):
+        """Replace measured methods of the level with timed ones"""
+        for phase, (attribute, name) in self.PHASES.items():
+            owner = getattr(level, attribute) if attribute else level
+            setattr(owner, name, self._timed(phase, getattr(owner, name)))
+
+    def _timed(self, phase, method):
+        """Wrap the method, so its time gets saved under the phase"""
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            if self.measuring:
+                self.timings[phase].append((perf_counter() - start) * 1000)
+            return result
+        return timed
+
+    def _summary(self, times):
+        """Calculate percentiles of the times, in milliseconds"""
+        if not times:
+            return {"count": 0}
+        # Percentiles need at least two values
+        percentiles = statistics.quantiles(times * 2 if len(times) == 1 else times, n=100, method="inclusive")
+        return {
+            "count": len(times),
+            "mean": round(statistics.fmean(times), 4),
+            "p50": round(percentiles[49], 4),
+            "p95": round(percentiles[94], 4),
+            "p99": round(percentiles[98], 4),
+            "max": round(max(times), 4)
+        }
+
+
+def spawn_crowd(level, amount):
+    """Spawn enemies on the free tiles closest to the player"""
+    player_column = level.player.rect.centerx // settings.SIZE
+    player_row = level.player.rect.centery // settings.SIZE
+
+    # Free tiles of the active chunks at least two tiles away from the player, closest first
+    reach = settings.WORLD_CHUNK_SIZE * (settings.WORLD_ACTIVE_RADIUS + 1)
+    free_tiles = []
+    for row in range(player_row - reach, player_row + reach + 1):
+        for column in range(player_column - reach, player_column + reach + 1):
+            distance = max(abs(column - player_column), abs(row - player_row))
+            if distance >= 2 and level.world.is_free(column, row):
+                free_tiles.append((distance, row, column))
+    free_tiles.sort()
+
+    names = list(settings.enemy_info.keys())
+    for index, (distance, row, column) in enumerate(free_tiles[:amount]):
+        level._create_enemy(names[index % len(names)], column * settings.SIZE, row * settings.SIZE)
+
+
+def heal_player(level):
+    """Keep the player alive, so the level is never reset"""
+    level.player.health = level.player.stats["health"]
+
+
+def setup_crowd(level):
+    """Surround the player with a crowd of enemies"""
+    spawn_crowd(level, 200)
+
+
+def cut_grass(level):
+    """Place the player above the next grass tile, facing it"""
+    player = level.player
+    heal_player(level)
+    # Wait for the previous attack to end
+    if player.attack:
+        return
+
+    # First grass tile of the active chunks, in row order
+    for key in sorted(level.world.active, key=lambda key: (key[1], key[0])):
+        tiles = level.world.active[key].tiles
+        grass = tiles.alive_indexes("grass")
+        if len(grass):
+            break
+    else:
+        return
+    player.hitbox.midbottom = tiles.rect(grass[0]).midtop
+    player.rect.center = player.hitbox.center
+    player.state = "down"
+
+
+def setup_magic(level):
+    """Place some enemies around the player, for the spells to hit"""
+    spawn_crowd(level, 30)
+
+
+def cast_magic(level):
+    """Switch between flame, spark and energy ball, with the energy always full"""
+    player = level.player
+    heal_player(level)
+    player.energy = player.stats["energy"]
+    # Change the spell between attacks only
+    if player.attack:
+        return
+
+    spells = ["flame", "spark", "energy_ball"]
+    player.magic = spells[(spells.index(player.magic) + 1) % len(spells)] if player.magic in spells else spells[0]
+    player.magic_index = list(settings.magic_info.keys()).index(player.magic)
+
+
+# Walk around in a loop
+WALK_SCRIPT = [(180, {pygame.K_d}), (120, {pygame.K_s}), (180, {pygame.K_a}), (120, {pygame.K_w})]
+
+SCENARIOS = {
+    "idle": Scenario("idle"),
+    "walk": Scenario("walk", WALK_SCRIPT, before_frame=heal_player),
+    "crowd": Scenario("crowd", setup=setup_crowd, before_frame=heal_player),
+    "grass": Scenario("grass", [(1, {pygame.K_k})], before_frame=cut_grass),
+    "magic": Scenario("magic", [(1, {pygame.K_l})], setup=setup_magic, before_frame=cast_magic)
+}
+
+
+# If file is main, run the scenarios and print the results as JSON
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure frame times in scripted scenarios")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run, all of them by default: {', '.join(SCENARIOS)}")
+    parser.add_argument("--frames", type=int, default=600, help="measured frames of every scenario")
+    parser.add_argument("--warmup", type=int, default=60, help="frames run before measuring")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random numbers generator")
+    parser.add_argument("--output", help="file to save the results to, instead of printing them")
+    arguments = parser.parse_args()
+
+    # Check names of the chosen scenarios
+    unknown = [name for name in arguments.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    scenarios = arguments.scenarios or list(SCENARIOS)
+
+    benchmark = Benchmark(arguments.frames, arguments.warmup, arguments.seed)
+    results = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "frames": arguments.frames,
+        "warmup": arguments.warmup,
+        "seed": arguments.seed,
+        "scenarios": {name: benchmark.run(SCENARIOS[name]) for name in scenarios}
+    }
+
+    report = json.dumps(results, indent=4)
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
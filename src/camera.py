@@ -1,14 +1,21 @@
-import os
-
-import pygame.sprite
+import numpy
+import pygame
 
 from settings import settings
+from depth import DepthOrder
+from tracing import tracer
 
 
 class YSortCameraGroup(pygame.sprite.Group):
     """Camera with sprites sorted by Y coordinate"""
     def __init__(self):
         """Initialize the Y-sort camera"""
+        # Drawing order of the sprites
+        self.depth = DepthOrder()
+        # Sprites other than enemies, updated and re-sorted every frame
+        self.others = {}
+        # Sprites added since the last frame, sorted out once they have their type
+        self.pending = []
         super().__init__()
         # Get the game's surface and settings
         self.surface = pygame.display.get_surface()
@@ -19,10 +26,32 @@ class YSortCameraGroup(pygame.sprite.Group):
         # Camera offset
         self.offset = pygame.math.Vector2()
 
-        # Create floor surface and get its rectangle
-        self.floor_surface = pygame.image.load(os.path.join(settings.BASE_PATH,
-                                                            "../graphics/tilemap/ground.png")).convert()
-        self.floor_rect = self.floor_surface.get_rect(topleft=(0, 0))
+        # Floor baked in chunks, world with the static tiles, the pool of particles and the store of the enemies, set
+        # once the level is created
+        self.floor = None
+        self.world = None
+        self.particles = None
+        self.enemies = None
+
+        # Number of sprites drawn and skipped during the last frame
+        self.drawn_count = 0
+        self.culled_count = 0
+
+        # Enemies that were busy last frame, or got hit, and have to be updated even far from the player
+        self.active_enemies = {}
+        # Number of updated frames
+        self.frames = 0
+
+    def update(self, *args, **kwargs):
+        """Update every sprite, except for the sleeping enemies"""
+        self.frames += 1
+        self._sort_pending()
+
+        for sprite in list(self.others):
+            sprite.update(*args, **kwargs)
+        # Only the enemies that are awake, picked by the store
+        for enemy in self.enemies.awake():
+            enemy.update(*args, **kwargs)
 
     def special_draw(self, player):
         """Draw the sprites"""
@@ -30,22 +59,124 @@ class YSortCameraGroup(pygame.sprite.Group):
         self.offset.x = player.rect.x - self.half_width
         self.offset.y = player.rect.y - self.half_height
 
-        # Draw the floor
-        floor_offset_pos = self.floor_rect.topleft - self.offset
-        self.surface.blit(self.floor_surface, floor_offset_pos)
-
-        # Go through each of sprites and draw them based of Y position
-        for sprite in sorted(self.sprites(), key=lambda sp: sp.rect.centery):
-            # Get offset position of the object
-            offset_pos = sprite.rect.topleft - self.offset
-            # Draw it
-            self.surface.blit(sprite.image, offset_pos)
-
-    def enemy_update(self, player):
-        """Update the enemies"""
-        # Get every enemy sprite (only enemy sprites, discard other ones) (check if it has sprite_type)
-        enemy_sprites = [sprite for sprite in self.sprites() if hasattr(sprite, "sprite_type")
-                         and sprite.sprite_type == "enemy"]
+        # Draw the visible chunks of the floor
+        self.floor.draw(self.surface, self.offset)
+
+        # Visible area of the world, widened by the margin for sprites drawn past their rectangles
+        margin = settings.CULL_MARGIN
+        view_rect = pygame.Rect(self.offset.x - margin, self.offset.y - margin,
+                                self.half_width * 2 + margin * 2, self.half_height * 2 + margin * 2)
+        offset_x, offset_y = int(self.offset.x), int(self.offset.y)
+
+        # Wake up sleeping enemies that show up, so their animation is in time
+        enemies = self.enemies
+        for slot in numpy.flatnonzero(enemies.arrays["asleep"] & enemies.overlapping(view_rect)).tolist():
+            self.wake(enemies.sprites[slot])
+        # Re-sort the other sprites, enemies get re-sorted once they move
+        self._sort_pending()
+        self.depth.move(self.others)
+
+        # Static tiles and particles overlapping the camera, with their images and positions
+        tiles = self.world.visible(view_rect, offset_x, offset_y)
+        particles = self.particles.visible(view_rect, offset_x, offset_y)
+
+        # Go through each of sprites in the view's rows based of Y position, keep only the ones overlapping the camera
+        blit_sequence = []
+        for sprite in self.depth.ordered((view_rect.top, view_rect.bottom), *tiles, particles):
+            # Tiles and particles are already culled and placed
+            if sprite.__class__ is tuple:
+                blit_sequence.append(sprite)
+                continue
+
+            rect = sprite.rect
+            if view_rect.colliderect(rect):
+                # Save it at its offset position
+                blit_sequence.append((sprite.image, (rect.x - offset_x, rect.y - offset_y)))
+
+        # Draw all of them at once
+        self.surface.blits(blit_sequence, False)
+
+        # Save statistics of this frame
+        self.drawn_count = len(blit_sequence)
+        self.culled_count = len(self.spritedict) + self.world.count + self.particles.count - self.drawn_count
+
+    def add_internal(self, sprite, layer=None):
+        """Add the sprite to the group and to the drawing order"""
+        super().add_internal(sprite, layer)
+        self.depth.add(sprite)
+        # Sprites join groups before setting their type, so wait with sorting them out
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        """Remove the sprite from the group and from the drawing order"""
+        super().remove_internal(sprite)
+        self.depth.remove(sprite)
+        self.others.pop(sprite, None)
+
+    @tracer.traced("enemy_update")
+    def enemy_update(self, player, enemies):
+        """Update the enemies, deciding what all of them do at once"""
+        # Let enemies attack again and get hit again once their cooldowns passed
+        enemies.cooldown()
+
+        # From time to time, wake up enemies around the player and put the far ones to sleep
+        if self.frames % settings.ENEMY_SLEEP_INTERVAL == 0:
+            self._check_sleep(player, enemies)
+
+        # Get enemies close enough to notice the player, and the living ones that still have to go back to idle,
+        # in the order they were created
+        slots = enemies.select(player.rect.center, settings.ENEMY_NOTICE_RANGE,
+                               [enemy.slot for enemy in self.active_enemies if enemy.alive()])
+        # Choose their states and directions to the player
+        states, directions_x, directions_y = enemies.decide(slots, player.rect.center)
+
+        self.active_enemies = {}
         # Update every enemy
-        for enemy in enemy_sprites:
-            enemy.enemy_update(player)
+        for slot, state, direction_x, direction_y in zip(slots.tolist(), states, directions_x, directions_y):
+            enemy = enemies.sprites[slot]
+            if enemy.asleep:
+                self.wake(enemy)
+            enemy.enemy_update(enemies.STATES[state], (direction_x, direction_y))
+            # Remember the ones that aren't idle yet
+            if enemy.state != "idle":
+                self.activate(enemy)
+
+    def activate(self, enemy):
+        """Make sure the enemy gets updated next frame, wherever it is"""
+        if enemy.asleep:
+            self.wake(enemy)
+        self.active_enemies[enemy] = None
+
+    def wake(self, enemy):
+        """Wake up the sleeping enemy, catching up on its animation"""
+        enemy.asleep = False
+        enemy.skip_frames(self.frames - enemy.sleep_frame)
+
+    def _check_sleep(self, player, enemies):
+        """Wake up enemies around the player, put the far idle ones to sleep"""
+        around = enemies.within(player.rect.center, settings.ENEMY_SLEEP_DISTANCE)
+        asleep = enemies.arrays["asleep"]
+
+        # Wake up the ones that got close
+        for slot in numpy.flatnonzero(asleep & around).tolist():
+            self.wake(enemies.sprites[slot])
+
+        # Put to sleep the far enemies that have nothing left to do
+        for slot in numpy.flatnonzero(enemies.arrays["used"] & ~asleep & ~around).tolist():
+            enemy = enemies.sprites[slot]
+            if enemy not in self.active_enemies and self._can_sleep(enemy):
+                enemy.asleep = True
+                enemy.sleep_frame = self.frames
+
+    def _can_sleep(self, enemy):
+        """Check if skipping the enemy's updates only delays its idle animation"""
+        return (enemy.state == "idle" and enemy.vulnerable and enemy.attack and enemy.health > 0
+                and not enemy.direction and not enemy.speed_boost)
+
+    def _sort_pending(self):
+        """Sort out sprites added since the last frame, keep the ones that aren't enemies"""
+        for sprite in self.pending:
+            # Skip sprites that were removed already
+            if sprite in self.spritedict and getattr(sprite, "sprite_type", None) != "enemy":
+                self.others[sprite] = None
+        self.pending.clear()
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+
+import numpy
+import pygame
+
+from settings import settings
+from assets import assets
+
+
+class TileLayer:
+    """Layer of the map drawn from a tileset"""
+    def __init__(self, layout, tileset_path):
+        """Initialize the layer"""
+        # Array of tile IDs, -1 for empty tiles
+        self.layout = layout
+        # Tileset the IDs point into
+        self.tileset = assets.image(tileset_path)
+        self.tileset_columns = self.tileset.get_width() // settings.SIZE
+
+        # Cut tiles out of the tileset only once
+        self.tiles = {}
+
+    def get_tile(self, tile_id):
+        """Get tile's surface from the tileset"""
+        if tile_id not in self.tiles:
+            # Calculate its position in the tileset
+            pos_x = (tile_id % self.tileset_columns) * settings.SIZE
+            pos_y = (tile_id // self.tileset_columns) * settings.SIZE
+            self.tiles[tile_id] = self.tileset.subsurface((pos_x, pos_y, settings.SIZE, settings.SIZE))
+        return self.tiles[tile_id]
+
+
+class FloorChunks:
+    """Floor layers of the map, baked into chunk surfaces on demand"""
+    def __init__(self, layers, columns, rows):
+        """Initialize the chunks"""
+        # Layers baked in order, bottom one first
+        self.layers = layers
+        # Map dimensions in tiles
+        self.columns = columns
+        self.rows = rows
+
+        # Chunk dimensions, in tiles and pixels
+        self.chunk_tiles = settings.CHUNK_SIZE
+        self.chunk_pixels = settings.CHUNK_SIZE * settings.SIZE
+
+        # Baked chunks by (column, row) of the chunk, least recently used first
+        self.chunks = OrderedDict()
+        # Memory used by the baked chunks, and the limit of it
+        self.used_bytes = 0
+        self.budget = settings.CHUNK_CACHE_BYTES
+
+        # Static objects baked into chunks by their positions, sorted by Y position when baked
+        self.objects = {}
+
+    def add_object(self, image, rect):
+        """Bake a static object into every chunk it overlaps, unless it's baked already"""
+        for key in self._chunk_keys(rect):
+            objects = self.objects.setdefault(key, {})
+            if rect.topleft in objects:
+                continue
+            objects[rect.topleft] = (rect.centery, image, rect.topleft)
+            # Re-bake chunks that already exist
+            self._discard(key)
+
+    def draw(self, surface, offset):
+        """Draw chunks that are visible on the surface"""
+        view_rect = pygame.Rect(offset.x, offset.y, surface.get_width(), surface.get_height())
+        offset_x, offset_y = int(offset.x), int(offset.y)
+
+        blit_sequence = []
+        for key in self._chunk_keys(view_rect):
+            # Mark the chunk as recently used, bake it if it doesn't exist
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self._bake(key)
+            self.chunks.move_to_end(key)
+
+            blit_sequence.append((chunk, (key[0] * self.chunk_pixels - offset_x,
+                                          key[1] * self.chunk_pixels - offset_y)))
+
+        # Drop chunks that weren't used for the longest, keeping the visible ones
+        while self.used_bytes > self.budget and len(self.chunks) > len(blit_sequence):
+            self._discard(next(iter(self.chunks)))
+
+        surface.blits(blit_sequence, False)
+
+    def _bake(self, key):
+        """Bake the chunk with given key"""
+        chunk_column, chunk_row = key
+        # Create the chunk's surface, with water under transparent tiles
+        chunk = pygame.Surface((self.chunk_pixels, self.chunk_pixels)).convert()
+        chunk.fill(settings.WATER_COLOR)
+
+        # Range of tiles in the chunk
+        first_column = chunk_column * self.chunk_tiles
+        first_row = chunk_row * self.chunk_tiles
+        last_column = min(first_column + self.chunk_tiles, self.columns)
+        last_row = min(first_row + self.chunk_tiles, self.rows)
+
+        # Draw every layer, only its non-empty tiles
+        for layer in self.layers:
+            area = layer.layout[first_row:last_row, first_column:last_column]
+            rows, columns = numpy.nonzero(area != -1)
+            blit_sequence = [(layer.get_tile(tile_id), (column * settings.SIZE, row * settings.SIZE))
+                             for row, column, tile_id in zip(rows.tolist(), columns.tolist(),
+                                                             area[rows, columns].tolist())]
+            chunk.blits(blit_sequence, False)
+
+        # Draw the static objects over the floor
+        for centery, image, pos in sorted(self.objects.get(key, {}).values(), key=lambda item: item[0]):
+            chunk.blit(image, (pos[0] - chunk_column * self.chunk_pixels, pos[1] - chunk_row * self.chunk_pixels))
+
+        # Store the chunk
+        self.chunks[key] = chunk
+        self.used_bytes += chunk.get_bytesize() * self.chunk_pixels * self.chunk_pixels
+        return chunk
+
+    def _discard(self, key):
+        """Discard the baked chunk, if it exists"""
+        chunk = self.chunks.pop(key, None)
+        if chunk is not None:
+            self.used_bytes -= chunk.get_bytesize() * self.chunk_pixels * self.chunk_pixels
+
+    def _chunk_keys(self, rect):
+        """Get keys of the map's chunks overlapping the rectangle"""
+        # Limit the range to the map
+        first_column = max(rect.left // self.chunk_pixels, 0)
+        first_row = max(rect.top // self.chunk_pixels, 0)
+        last_column = min((rect.right - 1) // self.chunk_pixels, (self.columns - 1) // self.chunk_tiles)
+        last_row = min((rect.bottom - 1) // self.chunk_pixels, (self.rows - 1) // self.chunk_tiles)
+
+        return [(column, row) for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
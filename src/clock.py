@@ -0,0 +1,25 @@
+import pygame
+
+from settings import settings
+
+
+class GameClock:
+    """Source of the game's time in milliseconds, real or simulated"""
+    def __init__(self, fixed_step=False):
+        """Initialize the clock"""
+        # Simulated clocks advance by one frame per tick, instead of following the real time
+        self.fixed_step = fixed_step
+        # Number of simulated frames
+        self.frames = 0
+
+    def get_ticks(self):
+        """Get current time in milliseconds"""
+        # Follow the real time
+        if not self.fixed_step:
+            return pygame.time.get_ticks()
+        # Otherwise calculate time of the current simulated frame
+        return self.frames * 1000 // settings.FPS
+
+    def tick(self):
+        """Advance the clock by one frame"""
+        self.frames += 1
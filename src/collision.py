@@ -0,0 +1,116 @@
+from itertools import count
+
+import numpy
+import pygame
+
+from settings import settings
+
+
+class CollisionGrid:
+    """Static hitboxes rasterized into a grid of map cells"""
+    def __init__(self, columns, rows, size=settings.SIZE, origin=(0, 0)):
+        """Initialize an empty collision grid, with its top left corner at the origin"""
+        # Grid dimensions, in cells
+        self.columns = columns
+        self.rows = rows
+        # Size of one cell in pixels
+        self.size = size
+        # Position of the grid in the world, in pixels
+        self.origin_x, self.origin_y = origin
+
+        # Number of static hitboxes touching each cell
+        self.occupancy = numpy.zeros((rows, columns), dtype=numpy.uint8)
+        # Keys of the hitboxes touching each cell, cell after cell, and where the keys of each cell start
+        self.cell_keys = numpy.zeros(0, dtype=numpy.int32)
+        self.cell_starts = numpy.zeros(rows * columns + 1, dtype=numpy.int32)
+
+        # Hitboxes as (left, top, right, bottom) extents and their cell ranges, by their keys
+        self.extents = numpy.zeros((0, 4), dtype=numpy.int32)
+        self.ranges = numpy.zeros((0, 4), dtype=numpy.int32)
+        # Hitboxes that block movement, and the order they were added in
+        self.active = numpy.zeros(0, dtype=numpy.bool_)
+        self.order = numpy.zeros(0, dtype=numpy.int64)
+        self.counter = count()
+
+    def rasterize(self, extents):
+        """Rasterize hitboxes of all static objects, given as (left, top, right, bottom) extents by their keys"""
+        self.extents = numpy.asarray(extents, dtype=numpy.int32).reshape(-1, 4)
+        self.ranges = ranges = self._cell_ranges(self.extents)
+        amount = len(ranges)
+        self.active = numpy.ones(amount, dtype=numpy.bool_)
+        self.order = numpy.arange(amount, dtype=numpy.int64)
+        self.counter = count(amount)
+
+        # List every cell of each hitbox's range, with the hitbox's key
+        widths = ranges[:, 2] - ranges[:, 0] + 1
+        cell_counts = widths * (ranges[:, 3] - ranges[:, 1] + 1)
+        keys = numpy.repeat(numpy.arange(amount), cell_counts)
+        positions = numpy.arange(len(keys)) - numpy.repeat(numpy.cumsum(cell_counts) - cell_counts, cell_counts)
+        cells = ((ranges[keys, 1] + positions // widths[keys]) * self.columns
+                 + ranges[keys, 0] + positions % widths[keys])
+
+        # Group the keys by cells, keeping them in order within each cell
+        self.cell_keys = keys[numpy.argsort(cells, kind="stable")].astype(numpy.int32)
+        counts = numpy.bincount(cells, minlength=self.rows * self.columns)
+        self.cell_starts = numpy.concatenate([[0], numpy.cumsum(counts)]).astype(numpy.int32)
+        self.occupancy = counts.reshape(self.rows, self.columns).astype(numpy.uint8)
+
+    def add(self, key):
+        """Put the removed hitbox back, as if it was added last"""
+        if self.active[key]:
+            return
+        self.active[key] = True
+        self.order[key] = next(self.counter)
+
+        left, top, right, bottom = self.ranges[key].tolist()
+        self.occupancy[top:bottom + 1, left:right + 1] += 1
+
+    def remove(self, key):
+        """Clear the hitbox from the grid"""
+        if not self.active[key]:
+            return
+        self.active[key] = False
+
+        # Unmark every cell it touched
+        left, top, right, bottom = self.ranges[key].tolist()
+        self.occupancy[top:bottom + 1, left:right + 1] -= 1
+
+    def nearby(self, rect):
+        """Get static hitboxes from the cells covered by the rectangle, in the order they were added"""
+        left, top, right, bottom = self._cell_range(rect)
+
+        # Most of the time entities move through empty cells, don't gather anything then
+        area = self.occupancy[top:bottom + 1, left:right + 1]
+        if not area.any():
+            return []
+
+        # Gather keys of the hitboxes from the occupied cells, only the ones still blocking
+        cells = [(top + row) * self.columns + left + column for row, column in numpy.argwhere(area).tolist()]
+        keys = numpy.unique(numpy.concatenate([self.cell_keys[self.cell_starts[cell]:self.cell_starts[cell + 1]]
+                                               for cell in cells]))
+        keys = keys[self.active[keys]]
+        keys = keys[numpy.argsort(self.order[keys], kind="stable")]
+        return [pygame.Rect(left, top, right - left, bottom - top)
+                for left, top, right, bottom in self.extents[keys].tolist()]
+
+    def _cell_range(self, rect):
+        """Get inclusive range of cells covered by the rectangle, clamped to the grid"""
+        left, top = rect.left - self.origin_x, rect.top - self.origin_y
+        right, bottom = rect.right - self.origin_x, rect.bottom - self.origin_y
+        return (min(max(left // self.size, 0), self.columns - 1),
+                min(max(top // self.size, 0), self.rows - 1),
+                min(max((right - 1) // self.size, 0), self.columns - 1),
+                min(max((bottom - 1) // self.size, 0), self.rows - 1))
+
+    def _cell_ranges(self, extents):
+        """Convert pixel extents (left, top, right, bottom) into inclusive cell ranges clamped to the grid"""
+        extents = extents - (self.origin_x, self.origin_y, self.origin_x, self.origin_y)
+        ranges = numpy.empty_like(extents)
+        ranges[:, :2] = extents[:, :2] // self.size
+        # Right and bottom edges are exclusive
+        ranges[:, 2:] = (extents[:, 2:] - 1) // self.size
+
+        # Keep the ranges inside the grid
+        numpy.clip(ranges[:, 0::2], 0, self.columns - 1, out=ranges[:, 0::2])
+        numpy.clip(ranges[:, 1::2], 0, self.rows - 1, out=ranges[:, 1::2])
+        return ranges
@@ -1,23 +1,185 @@
+from collections import deque
+from time import perf_counter
+
 import pygame
 
+from settings import settings
+from tracing import tracer
+from glyphs import text_renderer
+from assets import assets
+from audio import voices
+
+
+class Timer:
+    """Context measuring time of one phase of the frame, for the profiler and the tracer"""
+    def __init__(self, debug, name):
+        """Initialize the timer"""
+        self.debug = debug
+        self.name = name
+        self.start = 0
+        # Profiler and tracer that were enabled when measuring started, toggling them within the phase doesn't count
+        self.debug_on = False
+        self.trace_on = False
+
+    def __enter__(self):
+        """Start measuring"""
+        self.debug_on = self.debug.enabled
+        self.trace_on = tracer.enabled
+        if self.debug_on or self.trace_on:
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop measuring, save the time"""
+        if self.debug_on or self.trace_on:
+            end = perf_counter()
+            if self.debug_on:
+                self.debug.record(self.name, (end - self.start) * 1000)
+            # Tracing started during the phase has a newer origin, and stopped tracing was saved already
+            if self.trace_on and tracer.enabled:
+                tracer.add(self.name, self.start, end)
+
 
 class Debug:
-    """Debug helper"""
+    """Debug helper, with a toggleable profiler of the frames"""
     def __init__(self):
         """Initialize debug helper"""
-        # Setup pygame
-        pygame.init()
-        # Prepare the font
-        self.font = pygame.font.Font(None, 28)
+        # Show and measure only when it's enabled
+        self.enabled = False
+
+        # Recent frame times and intervals between frames, in milliseconds
+        self.frame_times = deque(maxlen=settings.PROFILER_FRAMES)
+        self.frame_intervals = deque(maxlen=settings.PROFILER_FRAMES)
+        # Recent times of each phase
+        self.phase_times = {}
+        # Timers of the phases reused every frame, in the order they were first started
+        self.timers = {}
+        # Start time of the current frame
+        self.frame_start = None
+
+        # Panel with the statistics, rendered again only every few hundred milliseconds
+        self.panel = None
+        self.panel_time = 0
 
     def start(self, msg, y=15, x=15):
         """Write certain information at given position"""
         # Get the main surface
         surface = pygame.display.get_surface()
         # Create a text rendered from given message, get its rectangle
-        debug_surface = self.font.render(str(msg), True, "White")
+        debug_surface = self._render_text(str(msg))
         debug_rect = debug_surface.get_rect(topleft=(x, y))
         # Draw the border around the debug message
         pygame.draw.rect(surface, "Black", debug_rect)
         # Draw the message onto the main surface
         surface.blit(debug_surface, debug_rect)
+
+    def toggle(self):
+        """Turn the profiler on or off"""
+        self.enabled = not self.enabled
+
+        # Start with clean statistics
+        self.frame_times.clear()
+        self.frame_intervals.clear()
+        self.phase_times = {}
+        self.frame_start = None
+        self.panel = None
+
+    def measure(self, name):
+        """Get context measuring time of the phase with given name"""
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = Timer(self, name)
+        return timer
+
+    def record(self, name, time):
+        """Save time of the phase, in milliseconds"""
+        times = self.phase_times.get(name)
+        if times is None:
+            times = self.phase_times[name] = deque(maxlen=settings.PROFILER_FRAMES)
+        times.append(time)
+
+    def begin_frame(self):
+        """Mark start of the frame"""
+        if not self.enabled:
+            return
+
+        current_time = perf_counter()
+        # Save the time since the previous frame started
+        if self.frame_start is not None:
+            self.frame_intervals.append((current_time - self.frame_start) * 1000)
+        self.frame_start = current_time
+
+    def end_frame(self):
+        """Mark end of the frame's work, save its time"""
+        if self.enabled and self.frame_start is not None:
+            self.frame_times.append((perf_counter() - self.frame_start) * 1000)
+
+    def display(self, level):
+        """Draw the profiler with the level's statistics"""
+        if not self.enabled:
+            return
+
+        # Render the panel again only from time to time, so it stays readable and cheap
+        current_time = pygame.time.get_ticks()
+        if self.panel is None or current_time - self.panel_time >= settings.PROFILER_REFRESH:
+            self.panel = self._render_panel(self._get_lines(level))
+            self.panel_time = current_time
+
+        pygame.display.get_surface().blit(self.panel, settings.PROFILER_POS)
+
+    def _get_lines(self, level):
+        """Get lines of text with the current statistics"""
+        lines = []
+
+        # Frame time and FPS
+        frame_time = self._average(self.frame_times)
+        interval = self._average(self.frame_intervals)
+        fps = 1000 / interval if interval else 0
+        lines.append(f"frame {frame_time:.2f} ms  fps {fps:.0f}")
+
+        # Average time of every phase, in the order they start in
+        for name in self.timers:
+            if name in self.phase_times:
+                lines.append(f"{name} {self._average(self.phase_times[name]):.2f} ms")
+
+        # Sprites in the level
+        types = [getattr(sprite, "sprite_type", None) for sprite in level.visible_sprites]
+        lines.append(f"sprites {level.visible_sprites.drawn_count} drawn / {len(types)}  tiles {len(level.world)}")
+        lines.append(f"chunks {len(level.world.active)} active, {len(level.world.ready)} ready, "
+                     f"{len(level.world.loading)} loading")
+        lines.append(f"enemies {types.count('enemy')} ({level.enemies.asleep_count()} asleep)  "
+                     f"particles {level.particles.count}")
+        lines.append(f"attacks {len(level.attack_sprites)}")
+        dropped = "  ".join(f"{reason} {count}" for reason, count in voices.dropped.items())
+        lines.append(f"voices {voices.played} played, dropped: {dropped}")
+        lines.append(f"sounds {len(assets.sounds)} decoded, {assets.sounds_bytes // 1024} / "
+                     f"{settings.SOUND_CACHE_BYTES // 1024} KB")
+        return lines
+
+    def _render_panel(self, lines):
+        """Render lines of text onto a single panel"""
+        surfaces = [self._render_text(line) for line in lines]
+
+        # Create the background big enough for every line
+        width = max(surface.get_width() for surface in surfaces)
+        height = sum(surface.get_height() for surface in surfaces)
+        panel = pygame.Surface((width, height))
+        panel.fill("Black")
+
+        # Put the lines below each other
+        pos_y = 0
+        for surface in surfaces:
+            panel.blit(surface, (0, pos_y))
+            pos_y += surface.get_height()
+        return panel
+
+    def _render_text(self, text):
+        """Get the rendered text, in pygame's default font"""
+        return text_renderer.render(text, "White", 28, None, True)
+
+    def _average(self, times):
+        """Calculate average of the times"""
+        return sum(times) / len(times) if times else 0
+
+
+debug = Debug()
@@ -0,0 +1,89 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from itertools import count
+
+
+class DepthOrder:
+    """Drawing order of sprites by Y coordinate, merged with static items that are sorted already"""
+    def __init__(self):
+        """Initialize the depth order"""
+        # Sprites sorted by their (centery, sequence) keys in two matching lists, and the key each of them is sorted
+        # by, re-sorted only when they move
+        self.keys = []
+        self.sprites = []
+        self.sprite_keys = {}
+        # How far a sprite's rectangle reached from its center, vertically, the most so far
+        self.reach = 0
+
+        # Sequence number of every sprite, breaks ties the same way as the group's order does, shared with the static
+        # items
+        self.sequence = {}
+        self.counter = count()
+        # Sprites added, that don't have their rectangle yet
+        self.pending = []
+
+    def add(self, sprite):
+        """Add the sprite, sort it in once it has its rectangle"""
+        self.sequence[sprite] = next(self.counter)
+        self.pending.append(sprite)
+
+    def remove(self, sprite):
+        """Remove the sprite from the order"""
+        del self.sequence[sprite]
+
+        # Sorted sprites are found by the key they were last sorted by
+        key = self.sprite_keys.pop(sprite, None)
+        if key is not None:
+            index = bisect_left(self.keys, key)
+            del self.keys[index]
+            del self.sprites[index]
+        # The ones not sorted in yet can be just dropped
+        else:
+            self.pending.remove(sprite)
+
+    def move(self, sprites):
+        """Re-sort the sprites, if they changed their positions"""
+        for sprite in sprites:
+            # Skip the ones not sorted in yet
+            key = self.sprite_keys.get(sprite)
+            if key is None:
+                continue
+
+            rect = sprite.rect
+            # Only re-sort the ones whose center left its row
+            if key[0] != rect.centery:
+                index = bisect_left(self.keys, key)
+                del self.keys[index]
+                del self.sprites[index]
+                self._insert(sprite)
+            else:
+                self.reach = max(self.reach, rect.centery - rect.top, rect.bottom - rect.centery)
+
+    def ordered(self, window, *extras):
+        """Get sprites that can reach into the (top, bottom) rows in drawing order, merged with extra items given as
+        sorted ((centery, sequence), item) pairs"""
+        self._sort_pending()
+
+        # Restrict the sprites to the Y centers of the ones that can reach into the rows, before merging them
+        start = bisect_left(self.keys, (window[0] - self.reach,))
+        end = bisect_right(self.keys, (window[1] + self.reach + 1,))
+
+        # Merge all the sorted lists
+        return [sprite for key, sprite in merge(zip(self.keys[start:end], self.sprites[start:end]), *extras)]
+
+    def _sort_pending(self):
+        """Sort in sprites that were added since the last frame"""
+        for sprite in self.pending:
+            self._insert(sprite)
+        self.pending.clear()
+
+    def _insert(self, sprite):
+        """Sort in the sprite at its current position"""
+        rect = sprite.rect
+        key = (rect.centery, self.sequence[sprite])
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.sprites.insert(index, sprite)
+        self.sprite_keys[sprite] = key
+        # Update the reach of the sprites
+        self.reach = max(self.reach, rect.centery - rect.top, rect.bottom - rect.centery)
@@ -0,0 +1,169 @@
+from itertools import count
+
+import numpy
+
+
+class EnemyStore:
+    """Data of every enemy kept in arrays, so all of them can be handled at once"""
+    # Stored fields and their types
+    FIELDS = {
+        "x": numpy.float64,
+        "y": numpy.float64,
+        "width": numpy.int64,
+        "height": numpy.int64,
+        "speed": numpy.int64,
+        # Health can drop by fractions, once the player's stats are upgraded
+        "health": numpy.float64,
+        "attack_radius": numpy.int64,
+        "notice_radius": numpy.int64,
+        "attack": numpy.bool_,
+        "attack_time": numpy.int64,
+        "attack_cooldown": numpy.int64,
+        "vulnerable": numpy.bool_,
+        "hit_time": numpy.int64,
+        "dodge_duration": numpy.int64,
+        # Enemies whose rectangle changed since the last time they were re-sorted and re-indexed
+        "moved": numpy.bool_,
+        # Idle enemies far from the player, that aren't updated, and the frame they fell asleep at
+        "asleep": numpy.bool_,
+        "sleep_frame": numpy.int64,
+        # Order the enemies were added in
+        "sequence": numpy.int64,
+        # Slots taken by living enemies
+        "used": numpy.bool_
+    }
+    # States chosen for the enemies, by their codes
+    STATES = ("idle", "move", "attack")
+
+    def __init__(self, clock, capacity=64):
+        """Initialize an empty store"""
+        # Clock of the level, for the cooldowns
+        self.clock = clock
+
+        # Arrays of every field, one slot for each enemy
+        self.arrays = {name: numpy.zeros(capacity, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        # Enemy sprite in each slot
+        self.sprites = [None] * capacity
+        # Slots that can be taken again
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.counter = count()
+
+    def add(self, enemy, rect):
+        """Add the enemy with given rectangle, return its slot"""
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+
+        # Start with fresh data
+        for array in self.arrays.values():
+            array[slot] = 0
+        self.arrays["used"][slot] = True
+        self.arrays["sequence"][slot] = next(self.counter)
+        self.sprites[slot] = enemy
+        self.move(slot, rect)
+        return slot
+
+    def remove(self, slot):
+        """Free the enemy's slot"""
+        self.arrays["used"][slot] = False
+        self.sprites[slot] = None
+        self.free_slots.append(slot)
+
+    def move(self, slot, rect):
+        """Save the enemy's new rectangle, mark it as moved if it changed"""
+        arrays = self.arrays
+        x, y = rect.center
+        if (arrays["x"][slot] != x or arrays["y"][slot] != y
+                or arrays["width"][slot] != rect.width or arrays["height"][slot] != rect.height):
+            arrays["x"][slot] = x
+            arrays["y"][slot] = y
+            arrays["width"][slot] = rect.width
+            arrays["height"][slot] = rect.height
+            arrays["moved"][slot] = True
+
+    def take_moved(self):
+        """Get the enemies that moved since the last call, in the order they were added"""
+        moved = self.arrays["moved"]
+        sprites = self._ordered(numpy.flatnonzero(moved & self.arrays["used"]))
+        moved[:] = False
+        return sprites
+
+    def awake(self):
+        """Get the enemies that aren't asleep, in the order they were added"""
+        return self._ordered(numpy.flatnonzero(self.arrays["used"] & ~self.arrays["asleep"]))
+
+    def asleep_count(self):
+        """Count the enemies that are asleep"""
+        return int(numpy.count_nonzero(self.arrays["used"] & self.arrays["asleep"]))
+
+    def cooldown(self):
+        """Let enemies attack again, and make them vulnerable again, once their cooldowns passed"""
+        current_time = self.clock.get_ticks()
+        arrays = self.arrays
+
+        attack = arrays["attack"]
+        attack |= arrays["used"] & ~attack & (current_time - arrays["attack_time"] >= arrays["attack_cooldown"])
+        vulnerable = arrays["vulnerable"]
+        vulnerable |= arrays["used"] & ~vulnerable & (current_time - arrays["hit_time"] >= arrays["dodge_duration"])
+
+    def within(self, pos, radius):
+        """Get mask of the slots of enemies whose centers lie within the radius of the position"""
+        return self.arrays["used"] & (self._distances(pos) <= radius)
+
+    def overlapping(self, rect):
+        """Get mask of the slots of enemies whose rectangles overlap the given rectangle"""
+        arrays = self.arrays
+        left = arrays["x"] - arrays["width"] // 2
+        top = arrays["y"] - arrays["height"] // 2
+        return (arrays["used"] & (left < rect.right) & (left + arrays["width"] > rect.left)
+                & (top < rect.bottom) & (top + arrays["height"] > rect.top))
+
+    def select(self, pos, radius, slots=()):
+        """Get slots of enemies within the radius and of the given ones, in the order enemies were added"""
+        mask = self.within(pos, radius)
+        mask[list(slots)] = True
+
+        return self._sorted(numpy.flatnonzero(mask))
+
+    def decide(self, slots, pos):
+        """Choose states of the enemies and their directions to the position, return them as lists"""
+        arrays = self.arrays
+        # Difference of positions, and its length
+        difference_x = pos[0] - arrays["x"][slots]
+        difference_y = pos[1] - arrays["y"][slots]
+        distances = numpy.sqrt(difference_x * difference_x + difference_y * difference_y)
+
+        # Attack if the player is in the attack radius and enemy is able to, move after him if he's noticed
+        states = numpy.where(distances <= arrays["notice_radius"][slots], 1, 0)
+        states[(distances <= arrays["attack_radius"][slots]) & arrays["attack"][slots]] = 2
+
+        # Normalized directions, none where the positions are the same
+        moving = distances > 0
+        directions_x = numpy.zeros(len(slots))
+        directions_y = numpy.zeros(len(slots))
+        directions_x[moving] = difference_x[moving] / distances[moving]
+        directions_y[moving] = difference_y[moving] / distances[moving]
+
+        return states.tolist(), directions_x.tolist(), directions_y.tolist()
+
+    def _sorted(self, slots):
+        """Sort the slots in the order enemies were added"""
+        return slots[numpy.argsort(self.arrays["sequence"][slots], kind="stable")]
+
+    def _ordered(self, slots):
+        """Get enemies of the slots, in the order they were added"""
+        return [self.sprites[slot] for slot in self._sorted(slots).tolist()]
+
+    def _distances(self, pos):
+        """Calculate distances between centers of every slot and the position"""
+        difference_x = pos[0] - self.arrays["x"]
+        difference_y = pos[1] - self.arrays["y"]
+        return numpy.sqrt(difference_x * difference_x + difference_y * difference_y)
+
+    def _grow(self):
+        """Double the capacity of the store"""
+        capacity = len(self.sprites)
+        for name, array in self.arrays.items():
+            self.arrays[name] = numpy.concatenate([array, numpy.zeros(capacity, dtype=array.dtype)])
+        self.sprites.extend([None] * capacity)
+        self.free_slots.extend(range(capacity * 2 - 1, capacity - 1, -1))
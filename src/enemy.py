@@ -1,17 +1,39 @@
-import os
-
 import pygame
 
 from settings import settings
 from entity import Entity
 from utilities import utilities
+from assets import assets
+from audio import voices
+from tracing import tracer
+
+
+def stored(name):
+    """Property that reads and writes the field of enemy's slot in the store"""
+    return property(lambda self: self.store.arrays[name][self.slot].item(),
+                    lambda self, value: self.store.arrays[name].__setitem__(self.slot, value))
 
 
 class Enemy(Entity):
-    """Enemy class"""
-    def __init__(self, name, pos, group, object_sprites, damage_player, death_particles, increase_exp):
+    """Enemy class, a view of its data kept in the enemy store"""
+    # Statistics, timers and flags kept in the store
+    speed = stored("speed")
+    health = stored("health")
+    attack_radius = stored("attack_radius")
+    notice_radius = stored("notice_radius")
+    attack = stored("attack")
+    attack_time = stored("attack_time")
+    attack_cooldown = stored("attack_cooldown")
+    vulnerable = stored("vulnerable")
+    hit_time = stored("hit_time")
+    dodge_duration = stored("dodge_duration")
+    # Sleep state, handled by the camera
+    asleep = stored("asleep")
+    sleep_frame = stored("sleep_frame")
+
+    def __init__(self, name, pos, group, collision_grid, damage_player, death_particles, increase_exp, clock, store):
         """Initialize the enemy"""
-        super().__init__(group)
+        super().__init__(group, clock)
 
         # Entity's type
         self.sprite_type = "enemy"
@@ -27,8 +49,12 @@ class Enemy(Entity):
         # Hitboxes
         self.hitbox = self.rect.inflate(0, -10)
 
-        # Object sprites (Sprites that have collisions)
-        self.object_sprites = object_sprites
+        # Take a slot in the store of enemies
+        self.store = store
+        self.slot = store.add(self, self.rect)
+
+        # Grid of static hitboxes (Sprites that have collisions)
+        self.collision_grid = collision_grid
 
         # Get enemies information dictionary
         enemy_info = settings.enemy_info[name]
@@ -49,15 +75,12 @@ class Enemy(Entity):
 
         # Attack flag
         self.attack = True
-        # Attack timer and cooldown
-        self.attack_time = None
+        # Attack cooldown, the timer starts with the first attack
         self.attack_cooldown = 400
 
         # Vulnerability flag
         self.vulnerable = True
-        # Last time getting hit
-        self.hit_time = None
-        # Duration of the invincibility
+        # Duration of the invincibility, the timer starts with the first hit
         self.dodge_duration = 350
 
         # Get the function to damage player
@@ -68,16 +91,12 @@ class Enemy(Entity):
         # Get the function reference to trigger particles on death
         self.death_particles = death_particles
 
-        # Sound effects
-        self.death_sound = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/death.wav"))
-        self.hit_sound = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/hit.wav"))
-        self.attack_sound = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, enemy_info["attack_sound"]))
-
-        # Lower the volume of sounds
-        self.death_sound.set_volume(0.2)
-        self.hit_sound.set_volume(0.2)
-        self.attack_sound.set_volume(0.25)
+        # Sound effects, with lowered volume
+        self.death_sound = assets.sound("../audio/death.wav", 0.2)
+        self.hit_sound = assets.sound("../audio/hit.wav", 0.2)
+        self.attack_sound = assets.sound(enemy_info["attack_sound"], 0.25)
 
+    @tracer.traced("Enemy.update")
     def update(self):
         """Update the enemy"""
         # React on getting hit
@@ -87,31 +106,37 @@ class Enemy(Entity):
         self._move(self.speed)
         # Animate it
         self.animate()
-
-        # Check attack cooldown
-        self._attack_cooldown()
+        # Save the new rectangle in the store (cooldowns are checked there, for all enemies at once)
+        self.store.move(self.slot, self.rect)
 
         # Check and handle death
         self.death()
 
-    def enemy_update(self, player):
-        """Update the enemy only, without other sprites"""
-        # Get enemy's status
-        self._set_state(player)
+    def kill(self):
+        """Remove the enemy from all groups, free its slot in the store"""
+        super().kill()
+        if self.store.sprites[self.slot] is self:
+            self.store.remove(self.slot)
+
+    @tracer.traced("Enemy.enemy_update")
+    def enemy_update(self, state, direction):
+        """Update the enemy only, without other sprites, with state and direction chosen by the store"""
+        # Set enemy's status
+        self._set_state(state)
         # Make an action
-        self.action(player)
+        self.action(direction)
 
-    def action(self, player):
+    def action(self, direction):
         """Make an action based off state"""
         # Attack the player
         if self.state == "attack":
-            self.attack_time = pygame.time.get_ticks()
+            self.attack_time = self.clock.get_ticks()
             self.damage_player(self.attack_damage, self.attack_type)
             # Play the sound
-            self.attack_sound.play()
+            voices.play(self.attack_sound, "enemy", self.rect.center)
         # Move closer to the player
         elif self.state == "move":
-            self.direction = self._get_position_from_player(player)[1]
+            self.direction = pygame.math.Vector2(direction)
         # Don't do anything
         else:
             self.direction = pygame.math.Vector2()
@@ -138,11 +163,33 @@ class Enemy(Entity):
 
         # If enemy can't be hit, meaning it got hit earlier
         if not self.vulnerable:
-            # Set the alpha based off current time's sinus
-            self.image.set_alpha(self.wave_value())
-        # Otherwise just set the image to normal
-        else:
-            self.image.set_alpha(255)
+            # Use the image with alpha based off current time's sinus (frames are shared, never change them)
+            self.image = assets.faded(self.image, self.wave_value())
+
+    def skip_frames(self, count):
+        """Catch up on the idle animation frames skipped while sleeping"""
+        animation = self.animations[self.state]
+
+        # Steps since the animation last started over, None until it does
+        steps = None
+        # Advance the frame the same way animating does
+        while count > 0:
+            count -= 1
+            self.frame += self.animation_speed
+            if steps is not None:
+                steps += 1
+
+            if self.frame >= len(animation):
+                self.frame = 0
+                # After a full cycle from the first frame, skip all of its repeats at once
+                if steps is not None:
+                    count %= steps
+                steps = 0
+
+        # Set the current frame's image and update the rect
+        self.image = animation[int(self.frame)]
+        self.rect = self.image.get_rect(center=self.hitbox.center)
+        self.store.move(self.slot, self.rect)
 
     def get_damage(self, player, attack_type):
         """Get damage when hit by the player"""
@@ -152,7 +199,7 @@ class Enemy(Entity):
             self.direction = self._get_position_from_player(player)[1]
 
             # Play the hit sound
-            self.hit_sound.play()
+            voices.play(self.hit_sound, "enemy", self.rect.center, priority="hit")
 
             # If enemy was hit by a weapon, get damaged from it
             if attack_type == "weapon":
@@ -162,7 +209,7 @@ class Enemy(Entity):
                 self.health -= player.get_magic_damage()
 
             # Save the last hit's time
-            self.hit_time = pygame.time.get_ticks()
+            self.hit_time = self.clock.get_ticks()
             # Block the player from hitting the enemy right again
             self.vulnerable = False
 
@@ -173,7 +220,7 @@ class Enemy(Entity):
             self.kill()
 
             # Play the death sound
-            self.death_sound.play()
+            voices.play(self.death_sound, "enemy", self.rect.center, priority="death")
 
             # Add experience points for the player
             self.increase_exp(self.exp)
@@ -188,40 +235,12 @@ class Enemy(Entity):
             # Change direction by negative resistance, meaning a push back
             self.direction *= -self.resistance
 
-    def _attack_cooldown(self):
-        """Handle attack cooldown"""
-        # Get current time
-        current_time = pygame.time.get_ticks()
-
-        # If enemy can't attack, check the cooldown
-        if not self.attack:
-            # If cooldown has passed, allow enemy to attack again
-            if current_time - self.attack_time >= self.attack_cooldown:
-                self.attack = True
-        # If enemy isn't vulnerable, check the cooldown again
-        if not self.vulnerable:
-            # If cooldown has passed, make the enemy vulnerable
-            if current_time - self.hit_time >= self.dodge_duration:
-                self.vulnerable = True
-
-    def _set_state(self, player):
+    def _set_state(self, state):
         """Set state of the enemy"""
-        # Get the distance from the player
-        distance = self._get_position_from_player(player)[0]
-
-        # If player is in enemy's attack radius, attack him if its able to
-        if distance <= self.attack_radius and self.attack:
-            # If enemy didn't attack yet, set the frame to 0
-            if self.state != "attack":
-                self.frame = 0
-            # Set the state  to attack
-            self.state = "attack"
-        # If player is in enemy's notice radius, move after him
-        elif distance <= self.notice_radius:
-            self.state = "move"
-        # Otherwise just idle
-        else:
-            self.state = "idle"
+        # If enemy starts to attack, set the frame to 0
+        if state == "attack" and self.state != "attack":
+            self.frame = 0
+        self.state = state
 
     def _get_position_from_player(self, player):
         """Calculate distance between the enemy and player"""
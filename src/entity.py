@@ -5,9 +5,12 @@ import pygame
 
 class Entity(pygame.sprite.Sprite):
     """Entity of the game"""
-    def __init__(self, group):
+    def __init__(self, group, clock):
         super().__init__(group)
 
+        # Clock of the level
+        self.clock = clock
+
         # Entity's direction
         self.direction = pygame.math.Vector2()
 
@@ -21,18 +24,24 @@ class Entity(pygame.sprite.Sprite):
 
     def _move(self, speed):
         """Move the entity"""
-        # Normalize the direction if entity moves, to prevent speed up
-        if self.direction.magnitude() != 0:
-            self.direction = self.direction.normalize()
+        # Standing entity can't run into anything, skip the collisions
+        if not self.direction:
+            self.rect.center = self.hitbox.center
+            return
+
+        # Normalize the direction to prevent speed up
+        self.direction = self.direction.normalize()
 
         # Add speed boost if entity has one
         speed += self.speed_boost
 
-        # Move the entity, check the collisions
+        # Move the entity, check the collisions in cells it swept through
+        previous = self.hitbox.copy()
         self.hitbox.x += self.direction.x * speed
-        self._collision("horizontal")
+        self._collision("horizontal", previous)
+        previous = self.hitbox.copy()
         self.hitbox.y += self.direction.y * speed
-        self._collision("vertical")
+        self._collision("vertical", previous)
 
         # Apply hitbox position
         self.rect.center = self.hitbox.center
@@ -40,7 +49,7 @@ class Entity(pygame.sprite.Sprite):
     def wave_value(self):
         """Get value of sinus as image full value alpha"""
         # Store current sinus
-        value = sin(pygame.time.get_ticks())
+        value = sin(self.clock.get_ticks())
         # If it is beyond the X-Axis, return full alpha
         if value >= 0:
             return 255
@@ -48,29 +57,32 @@ class Entity(pygame.sprite.Sprite):
         else:
             return 0
 
-    def _collision(self, direction):
+    def _collision(self, direction, previous):
         """Handle entity's collisions"""
+        # Get static hitboxes only from the cells between previous and current position
+        hitboxes = self.collision_grid.nearby(self.hitbox.union(previous))
+
         # Handle horizontal collisions
         if direction == "horizontal":
-            # Go through each object sprite, check collisions
-            for sprite in self.object_sprites:
-                if sprite.hitbox.colliderect(self.hitbox):
+            # Go through each nearby hitbox, check collisions
+            for hitbox in hitboxes:
+                if hitbox.colliderect(self.hitbox):
                     # Right collisions (if entity moves right, there can't be left collision)
                     if self.direction.x > 0:
                         # Hug the entity to the wall
-                        self.hitbox.right = sprite.hitbox.left
+                        self.hitbox.right = hitbox.left
                     # Left collisions
                     elif self.direction.x < 0:
-                        self.hitbox.left = sprite.hitbox.right
+                        self.hitbox.left = hitbox.right
 
         # Handle vertical collisions
         if direction == "vertical":
-            for sprite in self.object_sprites:
-                if sprite.hitbox.colliderect(self.hitbox):
+            for hitbox in hitboxes:
+                if hitbox.colliderect(self.hitbox):
                     # Bottom collisions
                     if self.direction.y > 0:
-                        self.hitbox.bottom = sprite.hitbox.top
+                        self.hitbox.bottom = hitbox.top
                     # Top collisions
                     elif self.direction.y < 0:
-                        self.hitbox.top = sprite.hitbox.bottom
+                        self.hitbox.top = hitbox.bottom
 
@@ -0,0 +1,128 @@
+import pygame
+
+from settings import settings
+from assets import assets
+from tracing import tracer
+
+
+class GlyphAtlas:
+    """Glyphs of one font in one color, rasterized once onto a single surface"""
+    # Characters rasterized up front, every printable ASCII character
+    CHARACTERS = "".join(chr(code) for code in range(32, 127))
+
+    def __init__(self, font, color, antialias):
+        """Rasterize every glyph into the atlas"""
+        self.font = font
+        self.color = color
+        self.antialias = antialias
+
+        # Area of each glyph in the atlas, and how far the pen moves after it
+        self.glyphs = {}
+        self.advances = {}
+        # Adjustments of the distances between pairs of glyphs
+        self.kernings = {}
+        # Glyphs that weren't rasterized up front, each on its own surface
+        self.extra_glyphs = {}
+
+        with tracer.span("build glyph atlas"):
+            glyph_surfaces = [self._rasterize(character) for character in self.CHARACTERS]
+
+            # Put the glyphs next to each other
+            width = sum(surface.get_width() for surface in glyph_surfaces)
+            height = max(surface.get_height() for surface in glyph_surfaces)
+            self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            pos_x = 0
+            for character, surface in zip(self.CHARACTERS, glyph_surfaces):
+                self.surface.blit(surface, (pos_x, 0))
+                self.glyphs[character] = pygame.Rect(pos_x, 0, surface.get_width(), surface.get_height())
+                pos_x += surface.get_width()
+
+    def layout(self, text):
+        """Draw the text from the glyphs onto a new surface"""
+        # Size of the text is the same as when the font renders it
+        text_surface = pygame.Surface(self.font.size(text), pygame.SRCALPHA)
+
+        pos_x = 0
+        previous = None
+        for character in text:
+            # Move the glyph closer to the previous one, if the font says so
+            if previous is not None:
+                pos_x += self._kerning(previous, character)
+            previous = character
+
+            area = self.glyphs.get(character)
+            if area is None:
+                text_surface.blit(self._extra_glyph(character), (pos_x, 0))
+            else:
+                text_surface.blit(self.surface, (pos_x, 0), area)
+            pos_x += self._advance(character)
+        return text_surface
+
+    def _rasterize(self, character):
+        """Rasterize a single glyph"""
+        return self.font.render(character, self.antialias, self.color)
+
+    def _extra_glyph(self, character):
+        """Get glyph that isn't in the atlas, rasterize it once"""
+        surface = self.extra_glyphs.get(character)
+        if surface is None:
+            surface = self.extra_glyphs[character] = self._rasterize(character)
+        return surface
+
+    def _kerning(self, first, second):
+        """Get adjustment of the distance between the pair of glyphs"""
+        pair = first + second
+        kerning = self.kernings.get(pair)
+        if kerning is None:
+            # It's whatever the pair's width differs by from both glyphs put next to each other
+            kerning = self.kernings[pair] = self.font.size(pair)[0] - self._advance(first) - self.font.size(second)[0]
+        return kerning
+
+    def _advance(self, character):
+        """Get distance the pen moves after the glyph"""
+        advance = self.advances.get(character)
+        if advance is None:
+            metrics = self.font.metrics(character)[0]
+            # Font without the glyph draws a replacement as wide as the rendered one
+            advance = metrics[4] if metrics else self.font.size(character)[0]
+            self.advances[character] = advance
+        return advance
+
+
+class TextRenderer:
+    """Text drawn from glyph atlases, with laid out strings kept for later, shared by the whole game"""
+    def __init__(self):
+        """Initialize the renderer"""
+        # Atlases by font, size, color and antialiasing
+        self.atlases = {}
+        # Laid out strings, by their text and font
+        self.texts = {}
+
+    def render(self, text, color=settings.TEXT_COLOR, size=settings.FONT_SIZE, path=settings.FONT, antialias=False):
+        """Get surface with the text, lay out only strings that weren't laid out yet"""
+        key = (text, path, size, color, antialias)
+        surface = self.texts.get(key)
+        if surface is None:
+            # Forget old strings, most of them won't show up again
+            if len(self.texts) >= settings.TEXT_CACHE:
+                self.texts.clear()
+            surface = self.texts[key] = self._layout(text, color, size, path, antialias)
+        return surface
+
+    def _layout(self, text, color, size, path, antialias):
+        """Lay out the text from the glyph atlas"""
+        # Antialiased glyphs are placed at fractional positions, whole pixels of the atlas can't match them
+        if antialias:
+            return assets.font(path, size).render(text, antialias, color)
+        return self.atlas(color, size, path, antialias).layout(text)
+
+    def atlas(self, color, size=settings.FONT_SIZE, path=settings.FONT, antialias=False):
+        """Get atlas of the font with given size and color, build it if needed"""
+        key = (path, size, color, antialias)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            atlas = self.atlases[key] = GlyphAtlas(assets.font(path, size), color, antialias)
+        return atlas
+
+
+text_renderer = TextRenderer()
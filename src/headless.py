@@ -0,0 +1,74 @@
+import os
+import argparse
+from random import Random
+from time import perf_counter
+
+# Use drivers that don't need a screen or a sound card, before pygame starts
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# Keep the output clean, so reports printed by the tools can be parsed
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from settings import settings
+from clock import GameClock
+from tracing import tracer
+
+
+class NoKeys:
+    """Keyboard state with no key pressed"""
+    def __getitem__(self, key):
+        """Check if the key is pressed"""
+        return False
+
+
+class Headless:
+    """Runner of the level without a window and without the frame rate cap"""
+    def __init__(self, seed=0, get_keys=None):
+        """Initialize the runner, with level's random numbers generator seeded"""
+        pygame.init()
+        # Display surface is still needed for converting images
+        self.screen = pygame.display.set_mode((settings.WIDTH, settings.HEIGHT))
+
+        # Import the level only now, as its modules need the display
+        from level import Level
+
+        # Simulated clock, every frame takes exactly 1/FPS of a second
+        self.clock = GameClock(fixed_step=True)
+        self.level = Level(self.clock, Random(seed), get_keys or NoKeys)
+
+    def step(self, draw=False):
+        """Run a single frame of the level"""
+        with tracer.span("frame"):
+            if draw:
+                self.screen.fill(settings.WATER_COLOR)
+            self.level.run(draw)
+
+            # Reset the game if player lost, like the game does
+            if self.level.end:
+                self.level.reset()
+        tracer.end_frame()
+
+    def simulate(self, frames, draw=False):
+        """Run given amount of frames as fast as possible, return the time it took in seconds"""
+        start = perf_counter()
+        for frame in range(frames):
+            self.step(draw)
+        return perf_counter() - start
+
+
+# If file is main, simulate the level and report its speed
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the level without a window")
+    parser.add_argument("--frames", type=int, default=600, help="amount of frames to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random numbers generator")
+    parser.add_argument("--draw", action="store_true", help="draw every frame too")
+    parser.add_argument("--trace", action="store_true", help="record a trace of the level's creation and every frame")
+    arguments = parser.parse_args()
+
+    if arguments.trace:
+        tracer.start(arguments.frames)
+    headless = Headless(arguments.seed)
+    seconds = headless.simulate(arguments.frames, arguments.draw)
+    print(f"{arguments.frames} frames in {seconds:.2f} s, {arguments.frames / seconds:.1f} frames per second")
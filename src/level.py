@@ -1,49 +1,74 @@
-from random import choice
-from random import randint
+from random import Random
+from time import perf_counter
+import logging
 
 import pygame
 
 from settings import settings
-from tile import Tile
+from world import World
 from player import Player
 from camera import YSortCameraGroup
 from utilities import utilities
 from weapon import Weapon
 from ui import UI
 from enemy import Enemy
-from particles import Animation
+from particles import Animation, ParticleSystem
 from magic import Magic
 from upgrade import UpgradeMenu
+from spatial import SpatialGroup
+from chunks import TileLayer, FloorChunks
+from mapcache import map_compiler
+from clock import GameClock
+from enemies import EnemyStore
+from audio import voices
+from debug import debug
+from tracing import tracer
+
+
+logger = logging.getLogger(__name__)
 
 
 class Level:
     """Level for the game"""
-    def __init__(self):
-        """Initialize the level"""
+    @tracer.traced("Level.__init__")
+    def __init__(self, clock=None, rng=None, get_keys=None):
+        """Initialize the level, optionally with own clock, random generator and keyboard state"""
         # Get game's display
         self.surface = pygame.display.get_surface()
 
+        # Clock, random numbers generator and keyboard, shared by everything in the level
+        self.clock = clock or GameClock()
+        self.rng = rng or Random()
+        self.get_keys = get_keys or pygame.key.get_pressed
+
         # Game pause flag
         self.pause = False
 
         # Sprites that are visible
         self.visible_sprites = YSortCameraGroup()
-        # Sprites that can be collided with
-        self.object_sprites = pygame.sprite.Group()
 
         # Sprites that can attack
         self.attack_sprites = pygame.sprite.Group()
-        # Sprites that can receive damage
-        self.damageable_sprites = pygame.sprite.Group()
+        # Sprites that can receive damage, indexed by position, grass is damaged through the tiles
+        self.damageable_sprites = SpatialGroup()
+        # Data of the enemies, handled all at once
+        self.enemies = EnemyStore(self.clock)
+        self.visible_sprites.enemies = self.enemies
 
         # Current active weapon
         self.active_weapon = None
 
+        # Time the last reset took, in milliseconds
+        self.reset_time = None
+
+        # Particles, drawn among the sorted sprites
+        self.particles = ParticleSystem(self.visible_sprites.depth.counter)
+        self.visible_sprites.particles = self.particles
         # Animations
-        self.animations = Animation()
+        self.animations = Animation(self.rng, self.particles)
 
         # Magic
-        self.magic = Magic(self.animations)
+        self.magic = Magic(self.animations, self.rng)
 
         # User's interface
         self.ui = UI()
@@ -52,117 +77,140 @@ class Level:
         self._create_map()
 
         # Upgrade menu
-        self.upgrade = UpgradeMenu(self.player)
+        self.upgrade = UpgradeMenu(self.player, self.clock, self.get_keys)
 
         # End of the game
         self.end = False
 
-    def run(self):
-        """Run the level"""
-        # Draw the level
-        self._draw()
-        # Display player's statistics
-        self.ui.display(self.player)
+    def run(self, draw=True):
+        """Run the level, optionally without drawing anything"""
+        # Move the clock to the new frame
+        self.clock.tick()
 
         # If the game is paused, draw the upgrade menu
         if self.pause:
-            self.upgrade.display()
+            # The world is frozen, draw it with the HUD only once, under the menu
+            if draw and self.upgrade.background is None:
+                self.surface.fill(settings.WATER_COLOR)
+                self._draw()
+                self.ui.display(self.player)
+                self.upgrade.open(self.surface.copy())
+            self.upgrade.display(draw)
 
         # Otherwise update all game mechanics
         else:
+            if draw:
+                # Draw the level
+                with debug.measure("draw"):
+                    self._draw()
+                # Display player's statistics
+                with debug.measure("ui"):
+                    self.ui.display(self.player)
+
             # Update positions
-            self._update()
+            with debug.measure("update"):
+                self._update()
+
+    @tracer.traced("Level.reset")
+    def reset(self):
+        """Restore the level to its initial state, reusing the map and all loaded assets"""
+        start_time = perf_counter()
+
+        # Remove everything that moved, got created or can attack, only tiles are static
+        for sprite in self.visible_sprites.sprites():
+            sprite.kill()
+        self.attack_sprites.empty()
+        self.particles.clear()
+        self.active_weapon = None
+        self.visible_sprites.active_enemies = {}
+
+        # Forget the cut grass and the enemies, place the player at the spawn again, with the chunks around him
+        self.world.reset()
+        self._create_player(*self.world.player_spawn)
+        self.world.update(self.player.rect.center, self.player.direction)
+
+        # Start with a closed menu for the new player
+        self.upgrade = UpgradeMenu(self.player, self.clock, self.get_keys)
+        self.pause = False
+        self.end = False
+
+        # Save and log the time it took
+        self.reset_time = (perf_counter() - start_time) * 1000
+        logger.info("Level reset in %.2f ms", self.reset_time)
 
     def _draw(self):
         # Draw all level objects
         self.visible_sprites.special_draw(self.player)
 
     def _update(self):
+        # Activate chunks of the world around the player
+        with debug.measure("world"):
+            self.world.update(self.player.rect.center, self.player.direction)
+        # Hear the sounds from around the player
+        voices.listen(self.player.rect.center)
+        # Advance the particles, before anything can create new ones this frame
+        self.particles.update()
+        # Get the frames of the player's current magic ready, before it's cast
+        self.animations.prefetch_magic(self.player.magic)
         # Update positions of the level objects
         self.visible_sprites.update()
+        # Re-index and re-sort only the enemies that moved
+        moved = self.enemies.take_moved()
+        self.damageable_sprites.refresh(moved)
+        self.visible_sprites.depth.move(moved)
         # Update positions of the enemies
-        self.visible_sprites.enemy_update(self.player)
+        self.visible_sprites.enemy_update(self.player, self.enemies)
 
         # Check for collisions resulting in damage
-        self._player_attack()
+        with debug.measure("player_attack"):
+            self._player_attack()
 
     def open_menu(self):
-        """Open the game's upgrade menu"""
+        """Open the game's upgrade menu, or close it if it's open"""
         self.pause = not self.pause
+        # Forget the frozen world once the game goes on
+        if not self.pause:
+            self.upgrade.close()
 
+    @tracer.traced("Level._create_map")
     def _create_map(self):
         """Create the map"""
-        # Map layouts stored in CSV
-        layouts = {
-            "limit": utilities.import_csv_layout("../map/map_FloorBlocks.csv"),
-            "object": utilities.import_csv_layout("../map/map_Objects.csv"),
-            "grass": utilities.import_csv_layout("../map/map_Grass.csv"),
-            "entities": utilities.import_csv_layout("../map/map_Entities.csv")
-        }
+        # Map layouts compiled from CSV
+        compiled_map = map_compiler.load()
+
+        # Floor and its details, baked in chunks
+        floor_layers = [
+            TileLayer(compiled_map.layers["floor"], "../graphics/tilemap/Floor.png"),
+            TileLayer(compiled_map.layers["details"], "../graphics/tilemap/details.png")
+        ]
+        self.visible_sprites.floor = FloorChunks(floor_layers, compiled_map.columns, compiled_map.rows)
+
         # Graphics of the map
         graphics = {
             "grass": utilities.import_folder("../graphics/Grass"),
             "objects": utilities.import_folder("../graphics/objects")
         }
-        # Create tiles
-        self._create_all_tiles(graphics, layouts)
-
-    def _create_all_tiles(self, graphics, layouts):
-        """Create all tiles with different types"""
-        # Go through every layout
-        for style, layout in layouts.items():
-            # Go through each row of the map
-            for row_index, row in enumerate(layout):
-                # Go through each column of the map
-                for column_index, column in enumerate(row):
-                    # Check if column isn't an empty space
-                    if column != '-1':
-                        # Calculate positions of the tile and create it there
-                        pos_x = column_index * settings.SIZE
-                        pos_y = row_index * settings.SIZE
-                        self._create_tile(pos_x, pos_y, style, column, graphics)
-
-    def _create_tile(self, pos_x, pos_y, style, column, graphics):
-        """Create tile at given position, based off style"""
-        # If it's a limit tile, create it and assign it as invisible
-        if style == "limit":
-            Tile((pos_x, pos_y), [self.object_sprites],
-                 "invisible")
-        # Create object
-        elif style == "object":
-            image = graphics["objects"][int(column)]
-            Tile((pos_x, pos_y), [self.visible_sprites, self.object_sprites],
-                 "object", image)
-        # Create grass
-        elif style == "grass":
-            # Choose a random grass image
-            random_image = choice(graphics["grass"])
-            Tile((pos_x, pos_y), [self.visible_sprites, self.object_sprites,
-                                  self.damageable_sprites], "grass", random_image)
-        # Create entities
-        elif style == "entities":
-            # If it is a player, put him here
-            if column == "394":
-                # Create the player and his weapon
-                self.player = Player((pos_x, pos_y), [self.visible_sprites], self.object_sprites,
-                                     self._create_weapon, self._destroy_weapon,
-                                     self._create_magic, self._destroy_magic)
-            # Otherwise put an enemy there, based off the ID set the name
-            else:
-                # Bamboo
-                if column == "390":
-                    name = "bamboo"
-                # Spirit
-                elif column == "391":
-                    name = "spirit"
-                # Racoon
-                elif column == "392":
-                    name = "raccoon"
-                # Squid
-                else:
-                    name = "squid"
-                Enemy(name, (pos_x, pos_y), [self.visible_sprites, self.damageable_sprites],
-                      self.object_sprites, self._damage_player, self._death_particles, self._increase_exp)
+        # World streamed in chunks, static tiles are drawn among the sprites
+        self.world = World(compiled_map, graphics, self.visible_sprites.floor, self.rng.getrandbits(32),
+                           self.visible_sprites.depth.counter, self._create_enemy)
+        self.visible_sprites.world = self.world
+
+        # Place the player, then activate chunks around him, with their tiles and enemies
+        self._create_player(*self.world.player_spawn)
+        self.world.update(self.player.rect.center, self.player.direction)
+
+    def _create_player(self, pos_x, pos_y):
+        """Create the player at given position"""
+        # Create the player and his weapon
+        self.player = Player((pos_x, pos_y), [self.visible_sprites], self.world,
+                             self._create_weapon, self._destroy_weapon,
+                             self._create_magic, self._destroy_magic, self.clock, self.get_keys)
+
+    def _create_enemy(self, name, pos_x, pos_y):
+        """Create an enemy with given name at given position, return it"""
+        return Enemy(name, (pos_x, pos_y), [self.visible_sprites, self.damageable_sprites],
+                     self.world, self._damage_player, self._death_particles, self._increase_exp, self.clock,
+                     self.enemies)
 
     def _create_weapon(self):
         """Create the weapon"""
@@ -180,19 +228,19 @@ class Level:
         """Create the magic spell"""
         # Use the healing spell
         if style == "heal":
-            self.magic.heal(self.player, strength, cost, [self.visible_sprites])
+            self.magic.heal(self.player, strength, cost)
         # Use the flame spell
         elif style == "flame":
-            self.magic.flame(self.player, cost, [self.visible_sprites, self.attack_sprites])
+            self.magic.flame(self.player, cost, [self.attack_sprites])
         # Use the shield spell
         elif style == "shield":
-            self.magic.shield(self.player, cost, [self.visible_sprites])
+            self.magic.shield(self.player, cost)
         # Use the energy ball
         elif style == "energy_ball":
             self.magic.energy_ball(self.player, cost, [self.visible_sprites, self.attack_sprites])
         # Use the spark
         elif style == "spark":
-            self.magic.spark(self.player, cost, [self.visible_sprites])
+            self.magic.spark(self.player, cost)
 
     def _destroy_magic(self):
         """Destroy the magic spell"""
@@ -204,31 +252,19 @@ class Level:
         if self.attack_sprites:
             # Go through each of them
             for attack_sprite in self.attack_sprites:
-                # Check for collisions between attack sprite and damageable ones
-                collisions = pygame.sprite.spritecollide(attack_sprite, self.damageable_sprites, False)
+                # Destroy the grass the attack touches
+                for chunk, index in self.world.query_rect(attack_sprite.rect, "grass"):
+                    self._cut_grass(chunk, index)
+
+                # Check for collisions between attack sprite and damageable ones near it
+                collisions = self.damageable_sprites.query_rect(attack_sprite.rect)
                 # If there is a collision, go through each target
                 if collisions:
                     for target in collisions:
-                        # If it's a grass, destroy it
-                        if target.sprite_type == "grass":
-                            # Get position for the particles
-                            pos = target.rect.center
-                            # Create a tiny offset
-                            offset = pygame.math.Vector2(0, 40)
-
-                            # Create from three up to seven leafs
-                            for leaf in range(randint(3, 6)):
-                                # Play the grass particles animation
-                                self.animations.grass_particles(pos - offset, [self.visible_sprites])
-
-                            # Destroy the grass
-                            target.kill()
-
                         # If enemy got hit by an energy ball
-                        elif target.sprite_type == "enemy" and attack_sprite.sprite_type == "energy_ball":
+                        if target.sprite_type == "enemy" and attack_sprite.sprite_type == "energy_ball":
                             # Create particles
-                            self.animations.create_particles("energy_ball", attack_sprite.rect.center,
-                                                             [self.visible_sprites])
+                            self.animations.create_particles("energy_ball", attack_sprite.rect.center)
                             # Destroy the energy ball
                             attack_sprite.kill()
 
@@ -236,11 +272,31 @@ class Level:
                             self.player.energy_balls_count -= 1
 
                             # Damage the enemy
-                            target.get_damage(self.player, attack_sprite.sprite_type)
+                            self._damage_enemy(target, attack_sprite.sprite_type)
 
                         # If it's an enemy, damage him
                         else:
-                            target.get_damage(self.player, attack_sprite.sprite_type)
+                            self._damage_enemy(target, attack_sprite.sprite_type)
+
+    def _cut_grass(self, chunk, index):
+        """Destroy the grass tile of the world's chunk, scattering its leafs"""
+        # Get position for the particles
+        pos = chunk.tiles.rect(index).center
+        # Create a tiny offset
+        offset = pygame.math.Vector2(0, 40)
+
+        # Create from three up to seven leafs
+        for leaf in range(self.rng.randint(3, 6)):
+            # Play the grass particles animation
+            self.animations.grass_particles(pos - offset)
+
+        # Destroy the grass, clear it from the collision grid
+        chunk.kill(index)
+
+    def _damage_enemy(self, enemy, attack_type):
+        """Damage the enemy, make sure it reacts even far from the player"""
+        enemy.get_damage(self.player, attack_type)
+        self.visible_sprites.activate(enemy)
 
     def _damage_player(self, value, attack_type):
         """Damage the player based off statistics"""
@@ -249,8 +305,7 @@ class Level:
             # If player has a shield
             if self.player.shield > 0:
                 # Draw the shield particles
-                self.animations.create_particles("shield", self.player.rect.center,
-                                                 [self.visible_sprites])
+                self.animations.create_particles("shield", self.player.rect.center)
                 # Decrease the shield amount
                 self.player.shield -= 1
             # Otherwise, decrease the health
@@ -259,7 +314,7 @@ class Level:
                 self.player.health -= value
 
             # Get the hit time
-            self.player.hit_time = pygame.time.get_ticks()
+            self.player.hit_time = self.clock.get_ticks()
             # Block him from receiving damage constantly
             self.player.vulnerable = False
 
@@ -270,8 +325,7 @@ class Level:
                 self.end = True
 
             # Create some particles
-            self.animations.create_particles(attack_type, self.player.rect.center,
-                                                  [self.visible_sprites])
+            self.animations.create_particles(attack_type, self.player.rect.center)
 
     def _increase_exp(self, amount):
         """Increase player's experience points"""
@@ -279,4 +333,4 @@ class Level:
 
     def _death_particles(self, pos, particle_type):
         """Trigger particles when entity died"""
-        self.animations.create_particles(particle_type, pos, self.visible_sprites)
+        self.animations.create_particles(particle_type, pos)
@@ -0,0 +1,103 @@
+import os
+
+import pygame
+
+from settings import settings
+from assets import assets
+from atlas import texture_atlas, sorted_walk
+from prefetch import prefetcher
+from mapcache import map_compiler
+from glyphs import text_renderer
+
+
+class Loader:
+    """Loader of the level's files, decoding them on background threads while the game shows the progress"""
+    def __init__(self):
+        """Initialize the loader"""
+        # Get the main surface
+        self.surface = pygame.display.get_surface()
+
+        # Files being decoded, in the order they get finished in, and number of the finished ones
+        self.files = []
+        self.loaded = 0
+        # Compiled map, loaded in the background too
+        self.map_future = None
+        self.map_loaded = False
+
+        # Loading bar in the middle of the screen
+        self.bar_rect = pygame.Rect(0, 0, settings.WIDTH // 3, settings.BAR_HEIGHT)
+        self.bar_rect.center = (settings.WIDTH // 2, settings.HEIGHT // 2)
+
+    @property
+    def progress(self):
+        """Part of the work that's done, from 0 to 1"""
+        return (self.loaded + self.map_loaded) / (len(self.files) + 1)
+
+    @property
+    def done(self):
+        """Check if everything got loaded"""
+        return self.loaded == len(self.files) and self.map_loaded
+
+    def start(self):
+        """Start decoding every file the level needs"""
+        self.files = self._level_files()
+        prefetcher.prefetch(self.files)
+        self.map_future = prefetcher.run(map_compiler.load)
+
+    def update(self):
+        """Finish loading the decoded files, with the steps only the main thread can do"""
+        while self.loaded < len(self.files) and prefetcher.is_ready(self.files[self.loaded]):
+            self._finish(self.files[self.loaded])
+            self.loaded += 1
+
+        if not self.map_loaded and self.map_future.done():
+            map_compiler.preloaded = self.map_future.result()
+            self.map_loaded = True
+
+    def display(self):
+        """Draw the loading screen"""
+        self.surface.fill(settings.BG_COLOR)
+
+        # Title above the bar
+        text_surface = text_renderer.render("Loading", settings.TEXT_COLOR)
+        text_rect = text_surface.get_rect(midbottom=(self.bar_rect.centerx, self.bar_rect.top - 10))
+        self.surface.blit(text_surface, text_rect)
+
+        # Bar filled as far as the loading went
+        progress_rect = self.bar_rect.copy()
+        progress_rect.width = self.bar_rect.width * self.progress
+        pygame.draw.rect(self.surface, settings.ENERGY_COLOR, progress_rect)
+        pygame.draw.rect(self.surface, settings.BORDER_COLOR, self.bar_rect, 3)
+
+    def _finish(self, path):
+        """Convert the decoded image to the screen's format, sounds are ready as they are"""
+        if path.lower().endswith(".png"):
+            # Whole atlas sheet, or a single image
+            if os.path.dirname(path) == texture_atlas.path:
+                texture_atlas.sheet(os.path.basename(path))
+            else:
+                assets.image(path)
+
+    def _level_files(self):
+        """Get full paths of the files the level needs, atlas sheets instead of the images packed in them"""
+        paths = []
+        for path in settings.LOADER_PATHS + [magic["graphic"] for magic in settings.magic_info.values()]:
+            path = os.path.normpath(os.path.join(settings.BASE_PATH, path))
+            if os.path.isdir(path):
+                paths.extend(os.path.join(dir_path, file) for dir_path, dirs, files in sorted_walk(path)
+                             for file in files)
+            else:
+                paths.append(path)
+
+        # Music is streamed while it plays, never decoded up front
+        music_paths = {os.path.normpath(os.path.join(settings.BASE_PATH, path)) for path in settings.MUSIC_PLAYLIST}
+
+        files = []
+        for path in paths:
+            if path.lower().endswith(".png"):
+                path = texture_atlas.file(path)
+            elif not path.lower().endswith((".wav", ".ogg")) or path in music_paths:
+                continue
+            if path is not None and path not in files:
+                files.append(path)
+        return files
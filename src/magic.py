@@ -1,28 +1,29 @@
-from random import randint
-import os
-
 import pygame
 
 from settings import settings
+from assets import assets
+from audio import voices
 
 
 class Magic:
     """Magic class"""
-    def __init__(self, animations):
+    def __init__(self, animations, rng):
         """Initialize the magic handler"""
         # Get the animations
         self.animations = animations
+        # Random numbers generator of the level
+        self.rng = rng
 
         # Load the sound effects
         self.sounds = {
-            "heal": pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/heal.wav")),
-            "flame": pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/Fire.wav")),
-            "spark": pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/spark.wav")),
-            "energy_ball": pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/energy_ball.wav")),
-            "shield": pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/shield.wav")),
+            "heal": assets.sound("../audio/heal.wav"),
+            "flame": assets.sound("../audio/Fire.wav"),
+            "spark": assets.sound("../audio/spark.wav"),
+            "energy_ball": assets.sound("../audio/energy_ball.wav"),
+            "shield": assets.sound("../audio/shield.wav"),
         }
 
-    def heal(self, player, strength, cost, group):
+    def heal(self, player, strength, cost):
         """Heal spell, heal the player"""
         # If player has enough energy to use heal spell
         if player.energy >= cost:
@@ -31,10 +32,10 @@ class Magic:
             # Drain his energy
             player.energy -= cost
 
-            self.sounds["heal"].play()
+            voices.play(self.sounds["heal"], "magic")
 
             # Animate the aura particles
-            self.animations.create_particles("aura", player.rect.center, group)
+            self.animations.create_particles("aura", player.rect.center)
             # Don't allow the player to heal him over the limit
             if player.health >= player.stats["health"]:
                 player.health = player.stats["health"]
@@ -42,16 +43,16 @@ class Magic:
                 # Get a small offset
                 offset = pygame.math.Vector2(0, -30)
                 # If player has healed not beyond the limit, animate the heal particles
-                self.animations.create_particles("heal", player.rect.center + offset, group)
+                self.animations.create_particles("heal", player.rect.center + offset)
 
-    def spark(self, player, cost, group):
+    def spark(self, player, cost):
         """Attack the enemy with spark, boost speed for a while"""
         # Cast it if player has enough energy
         if player.energy >= cost and player.energy_balls_count < 3:
             # Decrease player's energy
             player.energy -= cost
 
-            self.sounds["spark"].play()
+            voices.play(self.sounds["spark"], "magic")
 
             # Boost the player's speed by 2
             player.speed_boost = 2
@@ -62,38 +63,38 @@ class Magic:
         # Shoot four sparks and offset them
         for offset_multiply in range(1, 6):
             # Create curve offset
-            curve_offset = randint(-settings.SIZE // 2, settings.SIZE // 2)
+            curve_offset = self.rng.randint(-settings.SIZE // 2, settings.SIZE // 2)
 
             # Shoot horizontally
             if direction.x:
                 # Create offset based off current flame number
-                offset_x = (direction.x * offset_multiply) * settings.SIZE + randint(1, 20)
+                offset_x = (direction.x * offset_multiply) * settings.SIZE + self.rng.randint(1, 20)
 
                 # Calculate position
                 pos_x = player.rect.centerx + offset_x + curve_offset
                 pos_y = player.rect.centery + curve_offset
 
                 # Create the spark
-                self.animations.create_particles("spark", (pos_x, pos_y), group)
+                self.animations.create_particles("spark", (pos_x, pos_y))
 
             # Shoot vertically
             else:
                 # Get the offset and calculate position based off it
-                offset_y = (direction.y * offset_multiply) * settings.SIZE + randint(1, 20)
+                offset_y = (direction.y * offset_multiply) * settings.SIZE + self.rng.randint(1, 20)
                 pos_x = player.rect.centerx + curve_offset
                 pos_y = player.rect.centery + offset_y + curve_offset
 
                 # Create the spark
-                self.animations.create_particles("spark", (pos_x, pos_y), group)
+                self.animations.create_particles("spark", (pos_x, pos_y))
 
-    def shield(self, player, cost, group):
+    def shield(self, player, cost):
         """Cast a shield, defending the player"""
         # If player has enough energy, cast it
         if player.energy >= cost:
             # Drain the player's energy
             player.energy -= cost
 
-            self.sounds["shield"].play()
+            voices.play(self.sounds["shield"], "magic")
 
             # Turn on his shield, let him have 3 of them
             player.shield = 3
@@ -105,7 +106,7 @@ class Magic:
             # Decrease player's energy
             player.energy -= cost
 
-            self.sounds["energy_ball"].play()
+            voices.play(self.sounds["energy_ball"], "magic")
 
             # Create the energy ball
             ball = EnergyBall(player.rect.center, group)
@@ -114,20 +115,20 @@ class Magic:
             player.energy_balls_count += 1
 
     def flame(self, player, cost, group):
-        """Flame spell, attack the enemy with flame"""
+        """Flame spell, attack the enemy with flames that have hitboxes in the group"""
         # If player has enough energy to cast a spell
         if player.energy >= cost:
             # Decrease his energy
             player.energy -= cost
 
-            self.sounds["flame"].play()
+            voices.play(self.sounds["flame"], "magic")
 
             direction = self._get_direction(player)
 
             # Shoot five flames, offset them
             for offset_multiply in range(1, 6):
                 # Create curve offset to make the spell not so straight
-                curve_offset = randint(-settings.SIZE // 3, settings.SIZE // 3)
+                curve_offset = self.rng.randint(-settings.SIZE // 3, settings.SIZE // 3)
 
                 # Shoot horizontally
                 if direction.x:
@@ -179,12 +180,8 @@ class EnergyBall(pygame.sprite.Sprite):
         # Name
         self.sprite_type = "energy_ball"
 
-        # Load energy ball's image and get its rect
-        self.image = (pygame.image.load(os.path.join(settings.BASE_PATH,
-                                                     "../graphics/particles/energy_ball/energy_ball.png"))
-                      .convert_alpha())
-        self.image = pygame.transform.scale(self.image, (self.image.get_width() * 3,
-                                            self.image.get_height() * 3))
+        # Get energy ball's image three times bigger, and its rect
+        self.image = assets.image("../graphics/particles/energy_ball/energy_ball.png", 3)
         self.rect = self.image.get_rect(topleft=pos)
 
     #def draw(self):
@@ -1,61 +1,125 @@
 import sys
-import os
+import logging
+import argparse
+from time import perf_counter
 
 import pygame
 
 from settings import settings
 from level import Level
+from loader import Loader
+from assets import assets
+from audio import voices, music
+from debug import debug
+from tracing import tracer
+
+
+logger = logging.getLogger(__name__)
 
 
 class Game:
     """The entire game mechanics"""
     def __init__(self):
         """Initialize the game"""
+        # Start of the game, and times after it the first frame was shown and the game got playable, in milliseconds
+        self.start_time = perf_counter()
+        self.first_frame_time = None
+        self.playable_time = None
+
         pygame.init()
         # Set up main surface
         self.screen = pygame.display.set_mode((settings.WIDTH, settings.HEIGHT))
         pygame.display.set_caption("PyZelda")
 
+        # Create timer for calculating FPS
+        self.timer = pygame.time.Clock()
+
+        # Decode the level's files in the background, show the progress meanwhile
+        self._load()
         # Level of the game
         self.level = Level()
 
-        # Main music
-        self.music = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/main.ogg"))
-        self.music.set_volume(0.4)
-        # Play it in loop
-        self.music.play(loops=-1)
+        # Stream the music, playing the tracks over again
+        music.play(settings.MUSIC_PLAYLIST)
 
         # Load the death sound and lower its volume
-        self.death_sound = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/death.wav"))
-        self.death_sound.set_volume(0.2)
-
-        # Create timer for calculating FPS
-        self.timer = pygame.time.Clock()
+        self.death_sound = assets.sound("../audio/death.wav", 0.2)
 
     def run(self):
         """Run the game"""
         while True:
-            # Handle events
-            self._get_events()
-            # Draw everything
-            self._update_surface()
-            # Update objects
-            self._update_objects()
-
-            # Reset the game if player lost
-            if self.level.end:
-                self.level = Level()
-                self.death_sound.play()
-
-            # Remain set amount of FPS
+            with tracer.span("frame"):
+                # Start measuring the frame
+                debug.begin_frame()
+
+                # Handle events
+                with debug.measure("events"):
+                    self._get_events()
+                # Start the next track of the music once one ends
+                music.update()
+                # Draw everything
+                self._update_surface()
+                # The first frame of the level makes the game playable
+                if self.playable_time is None:
+                    self.playable_time = self._elapsed()
+                    logger.info("Time to first frame %.0f ms, time to playable %.0f ms",
+                                self.first_frame_time, self.playable_time)
+                # Update objects
+                self._update_objects()
+
+                # Reset the game if player lost, without building the world again
+                if self.level.end:
+                    self.level.reset()
+                    voices.play(self.death_sound, "player", priority="death")
+
+                # Frame's work is done, the rest is waiting
+                debug.end_frame()
+
+                # Remain set amount of FPS
+                with tracer.span("wait"):
+                    self.timer.tick(settings.FPS)
+
+            # Save the trace once enough frames were recorded
+            tracer.end_frame()
+
+    @tracer.traced("Game._load")
+    def _load(self):
+        """Load files of the level on background threads, while showing the loading screen"""
+        loader = Loader()
+        loader.start()
+
+        while True:
+            # Keep the window responsive
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self._quit()
+
+            loader.update()
+            loader.display()
+            pygame.display.update()
+            if self.first_frame_time is None:
+                self.first_frame_time = self._elapsed()
+
+            if loader.done:
+                break
             self.timer.tick(settings.FPS)
 
+    def _elapsed(self):
+        """Get time since start of the game, in milliseconds"""
+        return (perf_counter() - self.start_time) * 1000
+
+    def _quit(self):
+        """Quit the game"""
+        # Save the trace that's still being recorded
+        tracer.stop()
+        pygame.quit()
+        sys.exit()
+
     def _get_events(self):
         """Get and handle input events"""
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                self._quit()
 
             if event.type == pygame.KEYDOWN:
                 self._handle_keydown(event)
@@ -65,16 +129,26 @@ class Game:
         # Open upgrade menu on 'M' clicked
         if event.key == pygame.K_m:
             self.level.open_menu()
+        # Toggle the profiler on F3
+        elif event.key == pygame.K_F3:
+            debug.toggle()
+        # Record a trace of the next frames on F4
+        elif event.key == pygame.K_F4 and not tracer.enabled:
+            tracer.start()
 
 
     def _update_surface(self):
         """Update the main surface, draw objects"""
-        # Clean the screen
-        self.screen.fill(settings.WATER_COLOR)
+        # Clean the screen, the paused level covers all of it
+        if not self.level.pause:
+            self.screen.fill(settings.WATER_COLOR)
         # Draw the level and update it
         self.level.run()
+        # Show the profiler over everything
+        debug.display(self.level)
         # Update the main surface
-        pygame.display.update()
+        with debug.measure("display"):
+            pygame.display.update()
 
     def _update_objects(self):
         """Update all the objects"""
@@ -82,5 +156,14 @@ class Game:
 
 # If file is main, run the game
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PyLink, a Zelda like game")
+    parser.add_argument("--trace", type=int, metavar="FRAMES",
+                        help="record a trace of the start up and given amount of frames")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Start tracing before anything gets loaded
+    if arguments.trace:
+        tracer.start(arguments.trace)
     game = Game()
     game.run()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import io
+import json
+import os
+
+import numpy
+
+from settings import settings
+from sourcecache import SourceCache
+from utilities import utilities
+
+
+class CompiledMap:
+    """Map layers as typed arrays, with sparse lists of their non-empty tiles"""
+    def __init__(self, arrays):
+        """Initialize the compiled map from its arrays"""
+        self.arrays = arrays
+
+        # Dense layers, -1 marks an empty tile
+        self.layers = {name: arrays[name] for name in settings.MAP_LAYERS}
+        # Map dimensions in tiles
+        self.rows, self.columns = self.layers["limit"].shape
+
+    def tiles(self, name):
+        """Get rows, columns and IDs of non-empty tiles in the layer, in row order"""
+        return (self.arrays[f"{name}_rows"], self.arrays[f"{name}_columns"],
+                self.arrays[f"{name}_values"])
+
+
+class MapCompiler(SourceCache):
+    """Compiler of the CSV map layers into a binary cache"""
+    description = "Map cache"
+    fallback = "compiling the map"
+
+    def __init__(self):
+        """Initialize the compiler"""
+        # Path of the compiled map
+        self.cache_path = os.path.join(settings.BASE_PATH, settings.MAP_CACHE_PATH)
+        # Map loaded ahead of time, given out by the next load
+        self.preloaded = None
+
+    def load(self):
+        """Load the compiled map, compile it again if any of the CSV files changed"""
+        if self.preloaded is not None:
+            compiled_map, self.preloaded = self.preloaded, None
+            return compiled_map
+        sources = self._stat_sources()
+
+        # A broken or outdated cache is compiled again
+        arrays = self._read(self.cache_path, self._parse)
+        if arrays is None or not self._is_valid(arrays["sources"], sources):
+            arrays = self.compile(sources)
+        # Save new times of the files that were only touched
+        elif self._is_touched(arrays["sources"], sources):
+            arrays["sources"] = sources
+            self._save(arrays)
+
+        return CompiledMap(arrays)
+
+    def compile(self, sources=None):
+        """Compile every layer and save the result to the cache"""
+        sources = sources or self._stat_sources()
+        arrays = {}
+
+        for name, path in settings.MAP_LAYERS.items():
+            # Parse the layer into an array of tile IDs
+            layout = numpy.array(utilities.import_csv_layout(path), dtype=numpy.int16)
+            arrays[name] = layout
+
+            # List its non-empty tiles
+            rows, columns = numpy.nonzero(layout != -1)
+            arrays[f"{name}_rows"] = rows.astype(numpy.int32)
+            arrays[f"{name}_columns"] = columns.astype(numpy.int32)
+            arrays[f"{name}_values"] = layout[rows, columns]
+
+        # Store hashes of the sources, to recognize them later
+        self._hash_sources(sources)
+        arrays["sources"] = sources
+
+        self._save(arrays)
+        return arrays
+
+    def _source_paths(self):
+        """Get paths of every CSV layer"""
+        return list(settings.MAP_LAYERS.values())
+
+    def _parse(self, data):
+        """Parse the cache's arrays and the sources they were compiled from"""
+        with numpy.load(io.BytesIO(data)) as cache:
+            arrays = {name: cache[name] for name in cache.files}
+        arrays["sources"] = json.loads(str(arrays["sources"]))
+        return arrays
+
+    def _save(self, arrays):
+        """Save the arrays to the cache file"""
+        arrays = dict(arrays, sources=numpy.array(json.dumps(arrays["sources"])))
+        self._write(self.cache_path, lambda cache_file: numpy.savez(cache_file, **arrays))
+
+
+map_compiler = MapCompiler()
@@ -1,129 +1,309 @@
-from random import choice
+from collections import OrderedDict
 
+import numpy
 import pygame
 
+from settings import settings
+from assets import assets
 from utilities import utilities
 
 
-class Particle(pygame.sprite.Sprite):
-    """Particle effect class"""
-    def __init__(self, pos, group, frames, sprite_type=None):
-        """Initialize the particle"""
+class ParticleHitbox(pygame.sprite.Sprite):
+    """Hitbox of a particle that can hit enemies, it's never drawn"""
+    def __init__(self, rect, group):
+        """Initialize the hitbox"""
         super().__init__(group)
-
-        # Available frames and the current frame
-        self.frames = frames
-        self.frame = 0
-        # Animation speed
-        self.animation_speed = 0.15
-        # Image based off current frame
-        self.image = self.frames[self.frame]
-        # Rectangle of particle
-        self.rect = self.image.get_rect(center=pos)
+        # Rectangle of the particle
+        self.rect = rect
 
         # Sprite type
         self.sprite_type = "magic"
 
+
+class ParticleSystem:
+    """Pool of particles, with their frames and positions kept in arrays"""
+    # Stored fields and their types
+    FIELDS = {
+        "active": numpy.bool_,
+        # Frame table of the particle, current frame and animation speed
+        "table": numpy.int32,
+        "frame": numpy.float64,
+        "speed": numpy.float64,
+        # Rectangle of the particle's first frame, that it stays in
+        "left": numpy.int32,
+        "top": numpy.int32,
+        "width": numpy.int32,
+        "height": numpy.int32,
+        "centery": numpy.int32,
+        # Drawing order of particles with the same Y coordinate, shared with the sprites
+        "sequence": numpy.int64
+    }
+
+    def __init__(self, counter, capacity=settings.PARTICLE_POOL_SIZE):
+        """Initialize the pool"""
+        # Counter giving out sequence numbers of the drawing order
+        self.counter = counter
+
+        # Preallocated arrays of every field, one slot for each particle
+        self.arrays = {name: numpy.zeros(capacity, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        # Hitbox of each slot's particle, if it can hit
+        self.hitboxes = [None] * capacity
+        # Slots that are free to take
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        # Frame tables, their indexes by name, and number of frames in each of them
+        self.tables = []
+        self.table_indexes = {}
+        self.lengths = numpy.zeros(0, dtype=numpy.int32)
+
+    @property
+    def count(self):
+        """Number of living particles"""
+        return len(self.hitboxes) - len(self.free_slots)
+
+    def spawn(self, name, frames, pos, groups=(), speed=0.15):
+        """Start the named animation centered at the position, give it a hitbox in the groups if there are any"""
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+
+        # Particle stays in the rectangle of its first frame
+        rect = frames[0].get_rect(center=pos)
+        values = {
+            "active": True, "table": self._table_index(name, frames), "frame": 0, "speed": speed,
+            "left": rect.left, "top": rect.top, "width": rect.width, "height": rect.height,
+            "centery": rect.centery, "sequence": next(self.counter)
+        }
+        for name, value in values.items():
+            self.arrays[name][slot] = value
+
+        if groups:
+            self.hitboxes[slot] = ParticleHitbox(rect, groups)
+
     def update(self):
-        """Update the particle"""
-        self.animate()
+        """Advance every particle by one step, remove the finished ones"""
+        slots = numpy.flatnonzero(self.arrays["active"])
+        if not len(slots):
+            return
+
+        frame = self.arrays["frame"]
+        frame[slots] += self.arrays["speed"][slots]
+        # Remove particles that ran out of frames
+        finished = slots[frame[slots] >= self.lengths[self.arrays["table"][slots]]]
+        for slot in finished.tolist():
+            self._free(slot)
+
+    def visible(self, view_rect, offset_x, offset_y):
+        """Get ((centery, sequence), (image, position)) of particles overlapping the view, in drawing order"""
+        arrays = self.arrays
+        left, top = arrays["left"], arrays["top"]
+        # Check overlapping the same way rectangles do
+        mask = (arrays["active"] & (left < view_rect.right) & (left + arrays["width"] > view_rect.left)
+                & (top < view_rect.bottom) & (top + arrays["height"] > view_rect.top))
+        slots = numpy.flatnonzero(mask)
+        # Sort them by Y coordinate, then by the order they were created in
+        slots = slots[numpy.lexsort((arrays["sequence"][slots], arrays["centery"][slots]))]
+
+        return [((centery, sequence), (self.tables[table][int(frame)], (x - offset_x, y - offset_y)))
+                for centery, sequence, table, frame, x, y in zip(
+                    arrays["centery"][slots].tolist(), arrays["sequence"][slots].tolist(),
+                    arrays["table"][slots].tolist(), arrays["frame"][slots].tolist(),
+                    left[slots].tolist(), top[slots].tolist())]
+
+    def release(self, name):
+        """Let go of the named frame table, unless a living particle still plays it"""
+        index = self.table_indexes.get(name)
+        if index is None:
+            return
+        if not (self.arrays["active"] & (self.arrays["table"] == index)).any():
+            self.tables[index] = None
+
+    def clear(self):
+        """Remove every particle"""
+        for slot in numpy.flatnonzero(self.arrays["active"]).tolist():
+            self._free(slot)
+
+    def _free(self, slot):
+        """Remove the particle from its slot"""
+        self.arrays["active"][slot] = False
+        self.free_slots.append(slot)
+        # Take its hitbox away too
+        if self.hitboxes[slot] is not None:
+            self.hitboxes[slot].kill()
+            self.hitboxes[slot] = None
+
+    def _table_index(self, name, frames):
+        """Get index of the named frame table, register it if it's new or its frames were loaded again"""
+        index = self.table_indexes.get(name)
+        if index is None:
+            index = self.table_indexes[name] = len(self.tables)
+            self.tables.append(frames)
+            self.lengths = numpy.append(self.lengths, numpy.int32(len(frames)))
+        elif self.tables[index] is not frames:
+            self.tables[index] = frames
+            self.lengths[index] = len(frames)
+        return index
+
+    def _grow(self):
+        """Double the capacity of the pool"""
+        capacity = len(self.hitboxes)
+        for name, array in self.arrays.items():
+            self.arrays[name] = numpy.concatenate([array, numpy.zeros(capacity, dtype=array.dtype)])
+        self.hitboxes.extend([None] * capacity)
+        self.free_slots.extend(range(capacity * 2 - 1, capacity - 1, -1))
 
-    def animate(self):
-        """Animate the particle"""
-        # Increase the frame
-        self.frame += self.animation_speed
-        # If frames ended, kill the particle
-        if self.frame >= len(self.frames):
-            self.kill()
-        # Otherwise set the image to the current frame
-        else:
-            self.image = self.frames[int(self.frame)]
+
+class FrameCache:
+    """Loaded frame sets, the least recently used ones forgotten once they take more memory than the budget"""
+    def __init__(self, load, unload, budget=settings.ANIMATION_CACHE_BYTES):
+        """Initialize the cache, with functions loading and unloading a frame set by its name"""
+        self.load = load
+        self.unload = unload
+        self.budget = budget
+
+        # Frame sets, memory their own frames take and atlas sheets the rest are parts of, the most recently used
+        # at the end
+        self.sets = OrderedDict()
+        # Sheets charged to the cache, with the number of sets using each of them, a sheet is charged only once
+        self.sheets = {}
+        self.bytes = 0
+
+    def get(self, name):
+        """Get the frame set, load it if it isn't loaded"""
+        if name in self.sets:
+            self.sets.move_to_end(name)
+            return self.sets[name][0]
+
+        frames = self.load(name)
+        # Frames that are parts of atlas sheets keep their whole sheets in memory
+        size = 0
+        sheets = []
+        for frame in frames:
+            sheet = frame.get_parent()
+            if sheet is None:
+                size += self._bytes(frame)
+            elif sheet not in sheets:
+                sheets.append(sheet)
+        self.sets[name] = (frames, size, sheets)
+        self.bytes += size
+        for sheet in sheets:
+            if sheet not in self.sheets:
+                self.sheets[sheet] = 0
+                self.bytes += self._bytes(sheet)
+            self.sheets[sheet] += 1
+
+        # Forget the oldest sets, never the one that's needed now
+        while self.bytes > self.budget and len(self.sets) > 1:
+            old_name, (old_frames, old_size, old_sheets) = self.sets.popitem(last=False)
+            self.bytes -= old_size
+            # Stop charging sheets no other set uses
+            for sheet in old_sheets:
+                self.sheets[sheet] -= 1
+                if not self.sheets[sheet]:
+                    del self.sheets[sheet]
+                    self.bytes -= self._bytes(sheet)
+            self.unload(old_name)
+        return frames
+
+    def __contains__(self, name):
+        """Check if the frame set is loaded"""
+        return name in self.sets
+
+    def _bytes(self, surface):
+        """Calculate memory taken by the surface's pixels"""
+        return surface.get_bytesize() * surface.get_width() * surface.get_height()
 
 
 class Animation:
-    """Class for loading animations"""
-    def __init__(self):
+    """Class for loading animations on demand"""
+    # Folder of every frame set, with its scale and if it's flipped
+    FRAME_SETS = {
+        # Attacks
+        "claw": ("../graphics/particles/claw", 1, False),
+        "slash": ("../graphics/particles/slash", 1, False),
+        "thunder": ("../graphics/particles/thunder", 1, False),
+        "leaf_attack": ("../graphics/particles/leaf_attack", 1, False),
+        "sparkle": ("../graphics/particles/sparkle", 1, False),
+
+        # Player's magic
+        "flame": ("../graphics/particles/flame/frames", 1, False),
+        "heal": ("../graphics/particles/heal/frames", 1, False),
+        "aura": ("../graphics/particles/aura", 1, False),
+        # Energy ball 4 times bigger, shield 3 times bigger
+        "energy_ball": ("../graphics/particles/energy_ball/frames", 4, False),
+        "shield": ("../graphics/particles/shield/frames", 3, False),
+        "spark": ("../graphics/particles/spark/frames", 1, False),
+
+        # Monster kill
+        "squid": ("../graphics/particles/smoke_orange", 1, False),
+        "spirit": ("../graphics/particles/nova", 1, False),
+        "raccoon": ("../graphics/particles/raccoon", 1, False),
+        "bamboo": ("../graphics/particles/bamboo", 1, False),
+
+        # Leafs, and reflected ones for smooth animation
+        **{f"leaf{number}": (f"../graphics/particles/leaf{number}", 1, False) for number in range(1, 7)},
+        **{f"leaf{number}_flipped": (f"../graphics/particles/leaf{number}", 1, True) for number in range(1, 7)}
+    }
+    # Frame sets grass particles are chosen from
+    LEAF_SETS = (tuple(f"leaf{number}" for number in range(1, 7))
+                 + tuple(f"leaf{number}_flipped" for number in range(1, 7)))
+    # Frame sets each magic spell plays
+    MAGIC_SETS = {
+        "flame": ("flame",),
+        "heal": ("aura", "heal"),
+        "energy_ball": ("energy_ball",),
+        "shield": ("shield",),
+        "spark": ("spark",)
+    }
+
+    def __init__(self, rng, particles):
         """Initialize animation"""
-        # Load and store all the animations, that aren't loaded already
-        self.frames = {}
-        self._load_frames()
-
-        # Increase shield size by 3 times
-        for num in range(len(self.frames["shield"])):
-            frame = self.frames["shield"][num]
-            self.frames["shield"][num] = pygame.transform.scale(frame, (frame.get_rect().width * 3,
-                                                                        frame.get_rect().height * 3))
-
-        # Increase energy ball size by 4 times
-        for num in range(len(self.frames["energy_ball"])):
-            frame = self.frames["energy_ball"][num]
-            self.frames["energy_ball"][num] = pygame.transform.scale(frame, (frame.get_rect().width * 4,
-                                                                        frame.get_rect().height * 4))
-
-    def grass_particles(self, pos, group):
+        # Random numbers generator of the level
+        self.rng = rng
+        # Pool the particles are played in
+        self.particles = particles
+
+        # Frame sets loaded when they're first played
+        self.frames = FrameCache(self._load_frames, self._unload_frames)
+        # Magic whose frame sets were prefetched last
+        self.prefetched_magic = None
+
+        # Grass gets cut often, start decoding the leafs right away
+        for name in self.LEAF_SETS:
+            self.prefetch(name)
+
+    def grass_particles(self, pos):
         """Create grass particles, animate them"""
         # Get random leaf animation type
-        animation_frames = choice(self.frames["leaf"])
+        name = self.rng.choice(self.LEAF_SETS)
         # Create the particle animation
-        Particle(pos, group, animation_frames)
+        self.particles.spawn(name, self.frames.get(name), pos)
 
-    def create_particles(self, attack_type, pos, group):
-        """Create and animate particles"""
-        # Get animation type based off attack type
-        animation_frames = self.frames[attack_type]
-        # Create particle animation
-        Particle(pos, group, animation_frames)
+    def create_particles(self, attack_type, pos, groups=()):
+        """Create and animate particles, give them hitboxes in the groups if they can hit"""
+        # Get animation type based off attack type, create particle animation
+        self.particles.spawn(attack_type, self.frames.get(attack_type), pos, groups)
 
-    def reflect_images(self, frames):
-        """Reflect the images"""
-        flipped_frames = []
+    def prefetch(self, name):
+        """Start decoding the frame set in the background, if it isn't loaded"""
+        if name not in self.frames:
+            assets.prefetch(*self.FRAME_SETS[name])
 
-        # Go through each frame
-        for frame in frames:
-            # Flip it at X-Axis, append it to the list
-            flipped = pygame.transform.flip(frame, True, False)
-            flipped_frames.append(flipped)
-        # Return all the flipped images
-        return flipped_frames
-
-    def _load_frames(self):
-        """Load all the frames and add it to the dictionary"""
-        self.frames = {
-            # Attacks
-            "claw": utilities.import_folder("../graphics/particles/claw"),
-            "slash": utilities.import_folder("../graphics/particles/slash"),
-            "thunder": utilities.import_folder("../graphics/particles/thunder"),
-            "leaf_attack": utilities.import_folder("../graphics/particles/leaf_attack"),
-            "sparkle": utilities.import_folder("../graphics/particles/sparkle"),
-
-            # Player's magic
-            "flame": utilities.import_folder("../graphics/particles/flame/frames"),
-            "heal": utilities.import_folder("../graphics/particles/heal/frames"),
-            "aura": utilities.import_folder("../graphics/particles/aura"),
-            "energy_ball": utilities.import_folder("../graphics/particles/energy_ball/frames"),
-            "shield": utilities.import_folder("../graphics/particles/shield/frames"),
-            "spark": utilities.import_folder("../graphics/particles/spark/frames"),
-
-            # Monster kill
-            "squid": utilities.import_folder("../graphics/particles/smoke_orange"),
-            "spirit": utilities.import_folder("../graphics/particles/nova"),
-            "raccoon": utilities.import_folder("../graphics/particles/raccoon"),
-            "bamboo": utilities.import_folder("../graphics/particles/bamboo"),
-
-            # Leafs
-            "leaf": (
-                utilities.import_folder("../graphics/particles/leaf1"),
-                utilities.import_folder("../graphics/particles/leaf2"),
-                utilities.import_folder("../graphics/particles/leaf3"),
-                utilities.import_folder("../graphics/particles/leaf4"),
-                utilities.import_folder("../graphics/particles/leaf5"),
-                utilities.import_folder("../graphics/particles/leaf6"),
-                # Reflected ones, for smooth animation
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf1")),
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf2")),
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf3")),
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf4")),
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf5")),
-                self.reflect_images(utilities.import_folder("../graphics/particles/leaf6"))
-            )
-        }
+    def prefetch_magic(self, style):
+        """Prefetch frame sets of the magic spell, the one most likely to be cast next"""
+        if style == self.prefetched_magic:
+            return
+        self.prefetched_magic = style
+        for name in self.MAGIC_SETS.get(style, ()):
+            self.prefetch(name)
+
+    def _load_frames(self, name):
+        """Load the frame set, drop atlas sheets that it was only copied from"""
+        frames = utilities.import_folder(*self.FRAME_SETS[name])
+        assets.trim()
+        return frames
+
+    def _unload_frames(self, name):
+        """Forget the frame set, let its memory go"""
+        self.particles.release(name)
+        assets.release(*self.FRAME_SETS[name])
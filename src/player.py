@@ -1,21 +1,23 @@
-import os
-
 import pygame
 
 from settings import settings
 from utilities import utilities
+from assets import assets
+from audio import voices
 from entity import Entity
 
 
 class Player(Entity):
     """Player class"""
-    def __init__(self, pos, group, object_sprites, create_weapon, destroy_weapon,
-                 create_magic, destroy_magic):
-        super().__init__(group)
+    def __init__(self, pos, group, collision_grid, create_weapon, destroy_weapon,
+                 create_magic, destroy_magic, clock, get_keys):
+        super().__init__(group, clock)
+
+        # Function returning state of the keyboard
+        self.get_keys = get_keys
 
         # Load player's image and get its rect
-        self.image = pygame.image.load(os.path.join(settings.BASE_PATH,
-                                                    "../graphics/test/player.png")).convert_alpha()
+        self.image = assets.image("../graphics/test/player.png")
         self.rect = self.image.get_rect(topleft=pos)
 
         # Import player's assets
@@ -26,8 +28,8 @@ class Player(Entity):
         # Hitbox of the player
         self.hitbox = self.rect.inflate(-4, settings.HITBOX_OFFSETS["player"])
 
-        # Get object sprites
-        self.object_sprites = object_sprites
+        # Get grid of static hitboxes
+        self.collision_grid = collision_grid
 
         # Speed
         self.speed = 5
@@ -46,8 +48,7 @@ class Player(Entity):
         self.destroy_weapon = destroy_weapon
 
         # Weapon attack sound
-        self.weapon_sound = pygame.mixer.Sound(os.path.join(settings.BASE_PATH, "../audio/sword.wav"))
-        self.weapon_sound.set_volume(0.4)
+        self.weapon_sound = assets.sound("../audio/sword.wav", 0.4)
 
         # Create and destroy magic function references
         self.create_magic = create_magic
@@ -141,7 +142,7 @@ class Player(Entity):
         if self.attack:
             return
         # Get keys pressed
-        keys = pygame.key.get_pressed()
+        keys = self.get_keys()
 
         # Horizontal movement
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
@@ -167,16 +168,16 @@ class Player(Entity):
         if keys[pygame.K_k] or keys[pygame.K_z]:
             # Set attack flag to true and attack time to current one
             self.attack = True
-            self.attack_time = pygame.time.get_ticks()
+            self.attack_time = self.clock.get_ticks()
             self.create_weapon()
             # Play the physical attack sound
-            self.weapon_sound.play()
+            voices.play(self.weapon_sound, "player")
 
         # Magic attack on L or X
         elif keys[pygame.K_l] or keys[pygame.K_x]:
             # Magic flag and time is same as attack's
             self.attack = True
-            self.attack_time = pygame.time.get_ticks()
+            self.attack_time = self.clock.get_ticks()
 
             # Get magic's style (name), strength and cost
             style = list(settings.magic_info.keys())[self.magic_index]
@@ -191,7 +192,7 @@ class Player(Entity):
             # Make player unable to switch again
             self.can_weapon_switch = False
             # Get time of the switch
-            self.weapon_switch_time = pygame.time.get_ticks()
+            self.weapon_switch_time = self.clock.get_ticks()
 
             # If weapon index is still less than amount of weapons, increase it
             if self.weapon_index < len(list(settings.weapon_info.keys())) - 1:
@@ -206,7 +207,7 @@ class Player(Entity):
         if (keys[pygame.K_e] or keys[pygame.K_c]) and self.can_magic_switch:
             # Change player's ability to change magic to False, save the time
             self.can_magic_switch = False
-            self.magic_switch_time = pygame.time.get_ticks()
+            self.magic_switch_time = self.clock.get_ticks()
 
             # If index is still in bound, increment it
             if self.magic_index < len(list(settings.magic_info.keys())) - 1:
@@ -219,7 +220,7 @@ class Player(Entity):
 
     def _cooldown(self):
         """Manipulate the cooldowns"""
-        current_time = pygame.time.get_ticks()
+        current_time = self.clock.get_ticks()
 
         # Handle player attack cooldown
         if self.attack:
@@ -317,11 +318,8 @@ class Player(Entity):
 
         # If player just got hit, meaning he isn't vulnerable
         if not self.vulnerable:
-            # Set the alpha to current sinus value
-            self.image.set_alpha(self.wave_value())
-        # Otherwise set it to normal
-        else:
-            self.image.set_alpha(255)
+            # Use the image with alpha set to current sinus value (frames are shared, never change them)
+            self.image = assets.faded(self.image, self.wave_value())
 
     def get_value(self, index):
         """Get statistic value from an index"""
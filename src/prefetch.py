@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from settings import settings
+from tracing import tracer
+
+
+class Prefetcher:
+    """Decoder of image and sound files on background threads, so they are ready before the game needs them"""
+    def __init__(self):
+        """Initialize the prefetcher"""
+        # Threads decoding the files, started with the first job
+        self.executor = None
+        # Decoding of the files, finished or not, by their full paths
+        self.pending = {}
+
+    def prefetch(self, paths):
+        """Start decoding the files in the background"""
+        for path in paths:
+            if path not in self.pending:
+                self.pending[path] = self.run(self._traced_decode, path)
+
+    def run(self, function, *args):
+        """Run the function on a background thread, return its future"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=settings.PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        return self.executor.submit(function, *args)
+
+    def load(self, path):
+        """Get the decoded file, wait for its prefetch if it's still running, or decode it right away"""
+        future = self.pending.pop(path, None)
+        if future is not None:
+            return future.result()
+        return self._decode(path)
+
+    def is_ready(self, path):
+        """Check if the file was decoded, or isn't being decoded at all"""
+        future = self.pending.get(path)
+        return future is None or future.done()
+
+    def _traced_decode(self, path):
+        """Decode the file, on a background thread"""
+        with tracer.span("prefetch", path=path):
+            return self._decode(path)
+
+    def _decode(self, path):
+        """Decode the image, or the sound"""
+        if path.lower().endswith((".wav", ".ogg")):
+            return pygame.mixer.Sound(path)
+        return pygame.image.load(path)
+
+
+prefetcher = Prefetcher()
@@ -21,6 +21,83 @@ class Settings:
             "invisible": 0
         }
 
+        # CSV layers of the map
+        self.MAP_LAYERS = {
+            "limit": "../map/map_FloorBlocks.csv",
+            "object": "../map/map_Objects.csv",
+            "grass": "../map/map_Grass.csv",
+            "entities": "../map/map_Entities.csv",
+            "floor": "../map/map_Floor.csv",
+            "details": "../map/map_Details.csv"
+        }
+        # Map layers compiled into a binary file
+        self.MAP_CACHE_PATH = "../map/.cache/map.npz"
+
+        # Folders of graphics packed into texture atlases by atlas.py, and where the atlases are saved
+        self.ATLAS_CATEGORIES = {
+            "player": "../graphics/player",
+            "monsters": "../graphics/monsters",
+            "particles": "../graphics/particles",
+            "objects": "../graphics/objects",
+            "weapons": "../graphics/weapons"
+        }
+        self.ATLAS_PATH = "../graphics/.atlas"
+        # Maximum width and height of a single sheet
+        self.ATLAS_SHEET_SIZE = 1024
+
+        # Floor chunk size in tiles, and memory limit of the baked chunks
+        self.CHUNK_SIZE = 8
+        self.CHUNK_CACHE_BYTES = 24 * 1024 * 1024
+        # Bake objects into the floor if only blocked tiles lie within the margin around them
+        self.BAKE_OBJECTS = True
+        self.BAKE_OBJECT_MARGIN = self.SIZE
+        # World chunk size in tiles, chunks active around the player's one, and built chunks kept in memory,
+        # a chunk has to be bigger than half of the screen so the active ones always cover it
+        self.WORLD_CHUNK_SIZE = 16
+        self.WORLD_ACTIVE_RADIUS = 1
+        self.WORLD_CACHED_CHUNKS = 32
+
+        # Extra space around the camera, where sprites are still drawn
+        self.CULL_MARGIN = self.SIZE
+
+        # Particles preallocated in the pool
+        self.PARTICLE_POOL_SIZE = 256
+        # Threads decoding files in the background
+        self.PREFETCH_WORKERS = 4
+        # Files and folders of files the level needs, decoded while the loading screen is shown, with icons of magic
+        self.LOADER_PATHS = [
+            "../graphics/player", "../graphics/monsters", "../graphics/objects", "../graphics/weapons",
+            "../graphics/Grass", "../graphics/tilemap/Floor.png", "../graphics/tilemap/details.png",
+            "../graphics/test/player.png", "../audio"
+        ]
+        # Mixer channels of each category of sounds
+        self.SOUND_CHANNELS = {"player": 2, "magic": 2, "enemy": 4}
+        # Priorities of sounds, a sound takes the channel of a less important one when its category has none free
+        self.SOUND_PRIORITIES = {"normal": 0, "hit": 1, "death": 2}
+        # Frames within which the same sound isn't played twice, distance beyond the screen where sounds fade out
+        self.SOUND_DEDUPE_FRAMES = 3
+        self.SOUND_HEARING_DISTANCE = self.WIDTH // 2
+        # Memory limit of the decoded sound effects
+        self.SOUND_CACHE_BYTES = 2 * 1024 * 1024
+        # Tracks of the background music played in order, their volume, and time they fade over in, in milliseconds
+        self.MUSIC_PLAYLIST = ["../audio/main.ogg"]
+        self.MUSIC_VOLUME = 0.4
+        self.MUSIC_CROSSFADE = 1000
+        # Memory limit of the loaded particle animations, counting whole atlas sheets their frames are parts of
+        self.ANIMATION_CACHE_BYTES = 24 * 1024 * 1024
+
+        # Size of one spatial hash cell, used by attack and enemy queries
+        self.SPATIAL_CELL_SIZE = self.SIZE * 2
+
+        # Frames the profiler averages over, how often it refreshes in milliseconds and where it's shown
+        self.PROFILER_FRAMES = 120
+        self.PROFILER_REFRESH = 250
+        self.PROFILER_POS = (10, 64)
+
+        # Frames recorded by the tracer, and the file the trace gets saved to
+        self.TRACE_FRAMES = 300
+        self.TRACE_PATH = "../traces/trace.json"
+
         # Base file path
         self.BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
@@ -28,6 +105,8 @@ class Settings:
         self.BAR_HEIGHT = 20
         self.FONT = "../graphics/font/joystix.ttf"
         self.FONT_SIZE = 18
+        # Laid out strings of text kept at once
+        self.TEXT_CACHE = 256
         self.HEALTH_BAR_WIDTH = 200
         self.ENERGY_BAR_WIDTH = 140
         self.BOX_SIZE = 80
@@ -84,6 +163,13 @@ class Settings:
                        "attack_sound": "../audio/attack/slash.wav", "speed": 3, "resistance": 3,
                        "attack_radius": 50, "notice_radius": 300},
         }
+        # The furthest distance from which any enemy can notice the player
+        self.ENEMY_NOTICE_RANGE = max(info["notice_radius"] for info in self.enemy_info.values())
+
+        # Idle enemies further from the player than this go to sleep, well outside the screen and notice range
+        self.ENEMY_SLEEP_DISTANCE = self.WIDTH
+        # How often, in frames, enemies around the player get woken up and the far ones put to sleep
+        self.ENEMY_SLEEP_INTERVAL = 30
 
 
 settings = Settings()
@@ -0,0 +1,97 @@
+from hashlib import sha1
+import logging
+import os
+import zipfile
+
+from settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class SourceCache:
+    """Base of the caches built from source files, that recognize the sources by modification time, size and hash"""
+    # Name of the cache and what's done without it, for the warnings
+    description = "Cache"
+    fallback = "building it again"
+    # Errors of reading a broken cache file
+    read_errors = (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile)
+
+    def _source_paths(self):
+        """Get paths of the sources, relative to the game's files"""
+        raise NotImplementedError
+
+    def _stat_sources(self):
+        """Get modification time and size of every source"""
+        sources = {}
+        for path in self._source_paths():
+            stat = os.stat(self._full_path(path))
+            sources[path] = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+        return sources
+
+    def _hash_sources(self, sources):
+        """Store hashes of the sources, to recognize them later"""
+        for path, source in sources.items():
+            source["hash"] = self._hash(path)
+
+    def _is_valid(self, cached_sources, sources):
+        """Check if the cache was built from the current sources"""
+        if cached_sources.keys() != sources.keys():
+            return False
+
+        for path, source in sources.items():
+            cached = cached_sources[path]
+            # Unchanged modification time and size, the file is the same
+            if cached["mtime"] == source["mtime"] and cached["size"] == source["size"]:
+                continue
+            # The file was touched, compare its content
+            if cached["hash"] != self._hash(path):
+                return False
+        return True
+
+    def _is_touched(self, cached_sources, sources):
+        """Check if any of the valid cache's sources was only touched, give the current sources their hashes then"""
+        if all(cached_sources[path]["mtime"] == source["mtime"] and cached_sources[path]["size"] == source["size"]
+               for path, source in sources.items()):
+            return False
+
+        # Touched files keep their hashes, so their new times can be saved and they aren't hashed every time
+        for path, source in sources.items():
+            source["hash"] = cached_sources[path]["hash"]
+        return True
+
+    def _read(self, path, load):
+        """Read the cache file and load it with the function, get None if it's missing or broken"""
+        if not os.path.exists(path):
+            return None
+
+        # Read the whole file at once, a broken one is built again
+        try:
+            with open(path, "rb") as cache_file:
+                data = cache_file.read()
+            return load(data)
+        except self.read_errors as error:
+            logger.warning("%s %s can't be read, %s: %s", self.description, path, self.fallback, error)
+            return None
+
+    def _write(self, path, save):
+        """Write the cache file with the function, keep the cache only in memory if it can't be written"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Write a temporary file first, so a half written cache is never read
+            temporary_path = path + ".tmp"
+            with open(temporary_path, "wb") as cache_file:
+                save(cache_file)
+            os.replace(temporary_path, path)
+        except OSError as error:
+            logger.warning("%s %s can't be saved: %s", self.description, path, error)
+
+    def _hash(self, path):
+        """Calculate hash of the file's content"""
+        with open(self._full_path(path), "rb") as source_file:
+            return sha1(source_file.read()).hexdigest()
+
+    def _full_path(self, path):
+        """Get normalized, absolute path of the path relative to the game's files"""
+        return os.path.normpath(os.path.join(settings.BASE_PATH, path))
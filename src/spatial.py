@@ -0,0 +1,137 @@
+from itertools import count
+
+import pygame
+
+from settings import settings
+
+
+class SpatialHash:
+    """Uniform grid of cells, indexing sprites by the cells their rectangles cover"""
+    def __init__(self, cell_size=settings.SPATIAL_CELL_SIZE):
+        """Initialize the spatial hash"""
+        # Size of one cell in pixels
+        self.cell_size = cell_size
+
+        # Sprites stored in each cell, keyed by (column, row)
+        self.cells = {}
+        # Cell range (left, top, right, bottom) that each sprite is stored in
+        self.ranges = {}
+
+        # Insertion order of the sprites, so queries return them in a stable order
+        self.order = {}
+        self.counter = count()
+
+    def insert(self, sprite):
+        """Insert the sprite into every cell its rectangle covers"""
+        cell_range = self._cell_range(sprite.rect)
+        self.ranges[sprite] = cell_range
+        self.order[sprite] = next(self.counter)
+        self._add_to_cells(sprite, cell_range)
+
+    def remove(self, sprite):
+        """Remove the sprite from the hash"""
+        # Discard the sprite's cell range, don't do anything if it isn't stored
+        cell_range = self.ranges.pop(sprite, None)
+        if cell_range is None:
+            return
+        del self.order[sprite]
+        self._remove_from_cells(sprite, cell_range)
+
+    def move(self, sprite):
+        """Move the sprite to new cells, if its rectangle left the old ones"""
+        old_range = self.ranges.get(sprite)
+        new_range = self._cell_range(sprite.rect)
+
+        # Only touch the cells when the sprite actually changed them
+        if old_range != new_range:
+            if old_range is not None:
+                self._remove_from_cells(sprite, old_range)
+            self.ranges[sprite] = new_range
+            self._add_to_cells(sprite, new_range)
+
+    def query_rect(self, rect):
+        """Get sprites whose rectangles collide with the given rectangle"""
+        return [sprite for sprite in self._candidates(self._cell_range(rect))
+                if rect.colliderect(sprite.rect)]
+
+    def _candidates(self, cell_range):
+        """Get every sprite stored in the cell range, in insertion order"""
+        left, top, right, bottom = cell_range
+        found = {}
+
+        # Gather sprites from each of the cells
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = self.cells.get((column, row))
+                if cell:
+                    found.update(cell)
+
+        # Sort them the way they were inserted
+        return sorted(found, key=self.order.__getitem__)
+
+    def _cell_range(self, rect):
+        """Get range of cells covered by the rectangle"""
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def _add_to_cells(self, sprite, cell_range):
+        """Store the sprite in each cell of the range"""
+        left, top, right, bottom = cell_range
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                self.cells.setdefault((column, row), {})[sprite] = None
+
+    def _remove_from_cells(self, sprite, cell_range):
+        """Remove the sprite from each cell of the range"""
+        left, top, right, bottom = cell_range
+        for column in range(left, right + 1):
+            for row in range(top, bottom + 1):
+                cell = self.cells[(column, row)]
+                del cell[sprite]
+                # Drop empty cells, so the dictionary doesn't grow
+                if not cell:
+                    del self.cells[(column, row)]
+
+
+class SpatialGroup(pygame.sprite.Group):
+    """Sprite group that keeps its sprites indexed in a spatial hash"""
+    def __init__(self, *sprites):
+        """Initialize the group"""
+        # Sprites that got added, but don't have a rectangle yet
+        self.pending = []
+
+        self.hash = SpatialHash()
+        super().__init__(*sprites)
+
+    def add_internal(self, sprite, layer=None):
+        """Add the sprite, index it once it gets its rectangle"""
+        super().add_internal(sprite, layer)
+        # Sprites join groups before setting their rectangle, so wait with indexing them
+        self.pending.append(sprite)
+
+    def remove_internal(self, sprite):
+        """Remove the sprite along with its index"""
+        super().remove_internal(sprite)
+        self.hash.remove(sprite)
+
+    def refresh(self, moved):
+        """Re-index the given sprites that moved"""
+        self._insert_pending()
+        for sprite in moved:
+            # Skip sprites that aren't in the group
+            if sprite in self.hash.ranges:
+                self.hash.move(sprite)
+
+    def query_rect(self, rect):
+        """Get sprites colliding with the rectangle"""
+        self._insert_pending()
+        return self.hash.query_rect(rect)
+
+    def _insert_pending(self):
+        """Index the sprites that were added since the last query"""
+        for sprite in self.pending:
+            # Skip sprites that were removed before they got indexed, or are indexed already
+            if sprite in self.spritedict and sprite not in self.hash.ranges:
+                self.hash.insert(sprite)
+        self.pending.clear()
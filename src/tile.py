@@ -1,30 +1,205 @@
-import os
-
+import numpy
 import pygame
+
 from settings import settings
 
 
-class Tile(pygame.sprite.Sprite):
-    """Tiles that can be placed in a level"""
-    def __init__(self, pos, group, sprite_type, surface=pygame.Surface((settings.SIZE, settings.SIZE))):
-        """Initialize the tile"""
-        super().__init__(group)
+class TileTable:
+    """Static tiles of the map kept in arrays, with their images shared, instead of a sprite for each tile"""
+    # Stored fields and their types
+    FIELDS = {
+        # Rectangle of the tile's image
+        "left": numpy.int32,
+        "top": numpy.int32,
+        "right": numpy.int32,
+        "bottom": numpy.int32,
+        # Part of the tile that blocks movement
+        "hitbox_left": numpy.int32,
+        "hitbox_top": numpy.int32,
+        "hitbox_right": numpy.int32,
+        "hitbox_bottom": numpy.int32,
+        # Index of the tile's type, and of its image, -1 for invisible tiles
+        "type": numpy.int8,
+        "image": numpy.int32,
+        # Tiles drawn among the sprites, and their order among the ones with the same Y coordinate
+        "drawn": numpy.bool_,
+        "sequence": numpy.int64,
+        # Tiles that weren't destroyed
+        "alive": numpy.bool_
+    }
+    # Types of the tiles, by their indexes
+    TYPES = ("invisible", "object", "grass")
 
-        # Set the type of sprite
-        self.sprite_type = sprite_type
+    def __init__(self, counter=None):
+        """Initialize an empty table, taking drawing order of the tiles from the counter once it's given"""
+        # Counter shared with the sprites and particles, so tiles are sorted among them
+        self.counter = counter
 
-        # Y-Axis offset of hitbox based off sprite type
-        y_hitbox_offset = settings.HITBOX_OFFSETS[sprite_type]
+        # Arrays of every field, one item for each tile
+        self.arrays = {name: numpy.zeros(0, dtype=dtype) for name, dtype in self.FIELDS.items()}
+        # Images shared by the tiles, and the index of each of them
+        self.images = []
+        self.image_indexes = {}
+
+        # Drawn tiles sorted by their (centery, sequence) keys, with their Y centers
+        self.order = numpy.zeros(0, dtype=numpy.int64)
+        self.order_centery = numpy.zeros(0, dtype=numpy.int32)
+        # How far a drawn tile's rectangle reaches from its center, vertically
+        self.reach = 0
 
-        # Load tile image
-        self.image = surface
+    def __len__(self):
+        """Get number of the tiles"""
+        return len(self.arrays["alive"])
 
-        # If sprite isn't an object, create its rect normally
-        if sprite_type != "object":
-            self.rect = self.image.get_rect(topleft=pos)
-        # Otherwise offset the top position by tile size (objects are 2 times higher than other tiles)
+    @property
+    def count(self):
+        """Number of the drawn tiles that are alive"""
+        return int(numpy.count_nonzero(self.arrays["drawn"] & self.arrays["alive"]))
+
+    def add(self, sprite_type, pos_x, pos_y, images=None, drawn=True):
+        """Add tiles of one type at the positions with the images, invisible ones without them, return their indexes"""
+        amount = len(pos_x)
+        start = len(self)
+        if not amount:
+            return numpy.arange(start, start)
+        new = {name: numpy.zeros(amount, dtype=dtype) for name, dtype in self.FIELDS.items()}
+
+        # Invisible tiles are as big as one tile of the map
+        if images is None:
+            new["image"][:] = -1
+            widths = heights = numpy.full(amount, settings.SIZE)
         else:
-            self.rect = self.image.get_rect(topleft=(pos[0], pos[1] - settings.SIZE))
+            new["image"][:] = [self._image_index(image) for image in images]
+            sizes = numpy.array([image.get_size() for image in self.images], dtype=numpy.int32)
+            widths = sizes[new["image"], 0]
+            heights = sizes[new["image"], 1]
+
+        # Objects are 2 times higher than other tiles, so their top is moved up by tile size
+        new["left"][:] = pos_x
+        new["top"][:] = pos_y - settings.SIZE if sprite_type == "object" else pos_y
+        new["right"][:] = new["left"] + widths
+        new["bottom"][:] = new["top"] + heights
+
+        # Hitbox is the rectangle inflated vertically, by the offset of the type
+        y_hitbox_offset = settings.HITBOX_OFFSETS[sprite_type]
+        shift = pygame.Rect(0, 0, settings.SIZE, settings.SIZE).inflate(0, y_hitbox_offset).top
+        new["hitbox_left"][:] = new["left"]
+        new["hitbox_right"][:] = new["right"]
+        new["hitbox_top"][:] = new["top"] + shift
+        new["hitbox_bottom"][:] = new["bottom"] + shift + y_hitbox_offset
+
+        new["type"][:] = self.TYPES.index(sprite_type)
+        new["drawn"][:] = drawn if images is not None else False
+        new["alive"][:] = True
+        # Number the drawn tiles the way the sprites are numbered
+        if self.counter is not None:
+            drawn_indexes = numpy.flatnonzero(new["drawn"])
+            new["sequence"][drawn_indexes] = [next(self.counter) for index in range(len(drawn_indexes))]
+
+        for name, array in self.arrays.items():
+            self.arrays[name] = numpy.concatenate([array, new[name]])
+        self._sort()
+        return numpy.arange(start, start + amount)
+
+    def kill(self, index):
+        """Destroy the tile"""
+        self.arrays["alive"][index] = False
+
+    def revive(self, sprite_type):
+        """Bring back destroyed tiles of the type, drawn after everything created so far, return their indexes"""
+        indexes = self.dead_indexes(sprite_type)
+        if not len(indexes):
+            return indexes
+
+        self.arrays["alive"][indexes] = True
+        if self.counter is not None:
+            drawn_indexes = indexes[self.arrays["drawn"][indexes]]
+            self.arrays["sequence"][drawn_indexes] = [next(self.counter) for index in range(len(drawn_indexes))]
+            self._sort()
+        return indexes
+
+    def number(self, counter):
+        """Number every drawn tile from the counter in the order they were added, after all sprites so far"""
+        self.counter = counter
+        drawn_indexes = numpy.flatnonzero(self.arrays["drawn"])
+        self.arrays["sequence"][drawn_indexes] = [next(counter) for index in range(len(drawn_indexes))]
+        self._sort()
+
+    def alive_indexes(self, sprite_type):
+        """Get indexes of the living tiles of the type, in the order they were created"""
+        return numpy.flatnonzero(self.arrays["alive"] & (self.arrays["type"] == self.TYPES.index(sprite_type)))
+
+    def dead_indexes(self, sprite_type):
+        """Get indexes of the destroyed tiles of the type, in the order they were created"""
+        return numpy.flatnonzero(~self.arrays["alive"] & (self.arrays["type"] == self.TYPES.index(sprite_type)))
+
+    def rect(self, index):
+        """Get rectangle of the tile"""
+        arrays = self.arrays
+        left, top = int(arrays["left"][index]), int(arrays["top"][index])
+        return pygame.Rect(left, top, int(arrays["right"][index]) - left, int(arrays["bottom"][index]) - top)
+
+    def image(self, index):
+        """Get image of the tile, None for invisible ones"""
+        image_index = self.arrays["image"][index]
+        return self.images[image_index] if image_index != -1 else None
+
+    def hitboxes(self, indexes=slice(None)):
+        """Get (left, top, right, bottom) extents of the tiles' hitboxes, as an array"""
+        arrays = self.arrays
+        return numpy.stack([arrays["hitbox_left"][indexes], arrays["hitbox_top"][indexes],
+                            arrays["hitbox_right"][indexes], arrays["hitbox_bottom"][indexes]], axis=1)
+
+    def query_rect(self, rect, sprite_type):
+        """Get indexes of the living tiles of the type colliding with the rectangle, in their drawing order"""
+        arrays = self.arrays
+        indexes = numpy.flatnonzero(arrays["alive"] & (arrays["type"] == self.TYPES.index(sprite_type))
+                                    & self._colliding(rect))
+        return indexes[numpy.argsort(arrays["sequence"][indexes], kind="stable")].tolist()
+
+    def visible(self, view_rect, offset_x, offset_y):
+        """Get drawn tiles overlapping the view, as sorted ((centery, sequence), (image, position)) pairs"""
+        # Drawn tiles that can reach into the view vertically
+        start = numpy.searchsorted(self.order_centery, view_rect.top - self.reach, "left")
+        end = numpy.searchsorted(self.order_centery, view_rect.bottom + self.reach, "right")
+        candidates = self.order[start:end]
+
+        # Keep the living ones overlapping the view
+        arrays = self.arrays
+        mask = arrays["alive"][candidates] & self._colliding(view_rect, candidates)
+        indexes = candidates[mask]
+
+        images = self.images
+        return [((centery, sequence), (images[image], (left - offset_x, top - offset_y)))
+                for centery, sequence, image, left, top in zip(
+                    self.order_centery[start:end][mask].tolist(), arrays["sequence"][indexes].tolist(),
+                    arrays["image"][indexes].tolist(), arrays["left"][indexes].tolist(),
+                    arrays["top"][indexes].tolist())]
+
+    def _colliding(self, rect, indexes=slice(None)):
+        """Get mask of the tiles whose rectangles collide with the rectangle"""
+        arrays = self.arrays
+        return ((arrays["left"][indexes] < rect.right) & (arrays["right"][indexes] > rect.left)
+                & (arrays["top"][indexes] < rect.bottom) & (arrays["bottom"][indexes] > rect.top))
+
+    def _image_index(self, image):
+        """Get index of the shared image, add it if it's new"""
+        index = self.image_indexes.get(image)
+        if index is None:
+            index = self.image_indexes[image] = len(self.images)
+            self.images.append(image)
+        return index
+
+    def _sort(self):
+        """Sort the drawn tiles by their Y centers, then by their sequences"""
+        arrays = self.arrays
+        drawn = numpy.flatnonzero(arrays["drawn"])
+        # Y center the same way as a rectangle calculates it
+        centery = arrays["top"][drawn] + (arrays["bottom"][drawn] - arrays["top"][drawn]) // 2
+        order = numpy.lexsort((arrays["sequence"][drawn], centery))
 
-        # Hitbox of the tile
-        self.hitbox = self.rect.inflate(0, y_hitbox_offset)
+        self.order = drawn[order]
+        self.order_centery = centery[order]
+        if len(drawn):
+            self.reach = int(max(numpy.max(centery - arrays["top"][drawn]),
+                                 numpy.max(arrays["bottom"][drawn] - centery)))
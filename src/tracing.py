@@ -0,0 +1,127 @@
+from functools import wraps
+from time import perf_counter
+import json
+import logging
+import os
+import threading
+
+from settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Context recording one span of time into the trace"""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        """Initialize the span"""
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        """Start the span"""
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """End the span, save it"""
+        self.tracer.add(self.name, self.start, perf_counter(), self.args)
+
+
+class NullSpan:
+    """Span used while tracing is off, it does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class Tracer:
+    """Recorder of spans, saved as Chrome trace-event JSON, viewable in Perfetto or chrome://tracing"""
+    def __init__(self):
+        """Initialize the tracer"""
+        # Record spans only when it's enabled
+        self.enabled = False
+        # Recorded trace events
+        self.events = []
+
+        # Frames left to record, and the file they get saved to
+        self.frames_left = 0
+        self.path = None
+
+        # Time all the events are relative to
+        self.origin = perf_counter()
+        self.null_span = NullSpan()
+
+    def start(self, frames=settings.TRACE_FRAMES, path=settings.TRACE_PATH):
+        """Start recording given amount of frames"""
+        self.enabled = True
+        self.events = []
+        self.frames_left = frames
+        self.path = os.path.join(settings.BASE_PATH, path)
+        self.origin = perf_counter()
+        logger.info("Tracing %d frames", frames)
+
+    def stop(self):
+        """Stop recording, save the trace"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._save()
+
+    def span(self, name, **args):
+        """Get context recording a span with given name and arguments"""
+        if not self.enabled:
+            return self.null_span
+        return Span(self, name, args)
+
+    def traced(self, name):
+        """Decorator recording every call of the function as a span"""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Span(self, name, None):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def add(self, name, start, end, args=None):
+        """Save a span that lasted between given times from perf_counter"""
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1000000,
+            "dur": (end - start) * 1000000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident()
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def end_frame(self):
+        """Count the recorded frame, save the trace after the last one"""
+        if not self.enabled:
+            return
+        self.frames_left -= 1
+        if self.frames_left <= 0:
+            self.stop()
+
+    def _save(self):
+        """Save recorded events to the trace file"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as trace_file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, trace_file)
+        logger.info("Saved %d trace events to %s", len(self.events), self.path)
+
+
+tracer = Tracer()
@@ -1,8 +1,8 @@
-import os
-
 import pygame
 
 from settings import settings
+from assets import assets
+from glyphs import text_renderer
 
 
 class UI:
@@ -12,9 +12,6 @@ class UI:
         # Grab the main surface
         self.surface = pygame.display.get_surface()
 
-        # Create a new font
-        self.font = pygame.font.Font(settings.FONT, settings.FONT_SIZE)
-
         # Create bars
         self.health_bar_rect = pygame.Rect(10, 10, settings.HEALTH_BAR_WIDTH, settings.BAR_HEIGHT)
         self.energy_bar_rect = pygame.Rect(10, 34, settings.ENERGY_BAR_WIDTH, settings.BAR_HEIGHT)
@@ -27,106 +24,149 @@ class UI:
         self.magic_graphics = []
         self._convert_magic_dict()
 
+        # Persistent transparent overlay of the HUD
+        self.overlay = pygame.Surface(self.surface.get_size(), pygame.SRCALPHA)
+        # Rendered image of every element with the area it takes on the overlay, in drawing order
+        self.elements = {}
+        # Values each element was last rendered with
+        self.states = {}
+
     def display(self, player):
         """Display the player's statistics"""
         # Show the health and energy bars
-        self._show_bar(player.health, player.stats["health"], self.health_bar_rect, settings.HEALTH_COLOR)
-        self._show_bar(player.energy, player.stats["energy"], self.energy_bar_rect, settings.ENERGY_COLOR)
+        self._update("health", self._show_bar, self._bar_width(player.health, player.stats["health"],
+                     self.health_bar_rect), self.health_bar_rect, settings.HEALTH_COLOR)
+        self._update("energy", self._show_bar, self._bar_width(player.energy, player.stats["energy"],
+                     self.energy_bar_rect), self.energy_bar_rect, settings.ENERGY_COLOR)
 
         # Show player's experience
-        self._show_exp(player.exp)
+        self._update("exp", self._show_exp, int(player.exp))
 
         # Show the melee weapon box
-        self._weapon_overlay(player.weapon_index, not player.can_weapon_switch)
+        self._update("weapon", self._weapon_overlay, player.weapon_index, not player.can_weapon_switch)
         # Show the magic box
-        self._magic_overlay(player.magic_index, not player.can_magic_switch)
-
-    def _show_bar(self, current_amount, max_amount, bg_rect, color):
-        """Show a bar with given information"""
-        # Draw the background
-        pygame.draw.rect(self.surface, settings.BG_COLOR, bg_rect)
-
+        self._update("magic", self._magic_overlay, player.magic_index, not player.can_magic_switch)
+
+        # Put the overlay onto the screen at once, only the areas taken by elements, the rest of it is transparent
+        self.surface.blits([(self.overlay, area, area) for element_surface, area in self.elements.values()], False)
+
+    def _update(self, name, render, *state):
+        """Render the element into the overlay again, only if values it's rendered with changed"""
+        if self.states.get(name) != state:
+            self.states[name] = state
+            element_surface, pos = render(*state)
+            area = element_surface.get_rect(topleft=pos)
+
+            # Clear both the old and the new area, the element's size can change
+            dirty_rect = area.union(self.elements[name][1]) if name in self.elements else area
+            self.elements[name] = element_surface, area
+            self.overlay.fill((0, 0, 0, 0), dirty_rect)
+
+            # Redraw every element in there in order, elements can overlap
+            self.overlay.set_clip(dirty_rect)
+            self.overlay.blits(iter(self.elements.values()), False)
+            self.overlay.set_clip(None)
+
+    def _bar_width(self, current_amount, max_amount, bg_rect):
+        """Get width of the bar's current amount, in pixels"""
         # Calculate ratio of statistic and get bar's width from it
         ratio = current_amount / max_amount
         current_width = bg_rect.width * ratio
-        # Copy the background's rectangle and change its width to the current amount's width
+        # Let the rectangle round the width, like when it's drawn
         current_rect = bg_rect.copy()
         current_rect.width = current_width
+        return current_rect.width
+
+    def _show_bar(self, current_width, bg_rect, color):
+        """Render a bar with given information, return it with its position"""
+        bar_surface = pygame.Surface(bg_rect.size)
+        bar_rect = bar_surface.get_rect()
+        # Draw the background
+        pygame.draw.rect(bar_surface, settings.BG_COLOR, bar_rect)
+
+        # Copy the background's rectangle and change its width to the current amount's width
+        current_rect = bar_rect.copy()
+        current_rect.width = current_width
 
         # Draw the current amount bar
-        pygame.draw.rect(self.surface, color, current_rect)
+        pygame.draw.rect(bar_surface, color, current_rect)
         # Draw the bars border
-        pygame.draw.rect(self.surface, settings.BORDER_COLOR, bg_rect, 3)
+        pygame.draw.rect(bar_surface, settings.BORDER_COLOR, bar_rect, 3)
+        return bar_surface, bg_rect.topleft
 
     def _show_exp(self, exp):
-        """Show player's experience points"""
+        """Render player's experience points, return them with their position"""
         # Render the text (exp is converted first to int, in case of it changing into float. Then to string)
-        text_surface = self.font.render(str(int(exp)), False, settings.TEXT_COLOR)
+        text_surface = text_renderer.render(str(int(exp)), settings.TEXT_COLOR)
 
         # Calculate position of experience point text
         pos_x = settings.WIDTH - 20
         pos_y = settings.HEIGHT - 20
-        # Create the experience text rectangle
+        # Create the experience text rectangle, and rectangle of its frame
         text_rect = text_surface.get_rect(bottomright=(pos_x, pos_y))
+        frame_rect = text_rect.inflate(10, 10)
 
         # Draw the experience's background
-        pygame.draw.rect(self.surface, settings.BG_COLOR, text_rect.inflate(10, 10))
-        # Blit the experience text onto the main surface
-        self.surface.blit(text_surface, text_rect)
+        exp_surface = pygame.Surface(frame_rect.size)
+        exp_surface.fill(settings.BG_COLOR)
+        # Blit the experience text onto it
+        exp_surface.blit(text_surface, text_rect.move(-frame_rect.left, -frame_rect.top))
         # Draw the frame
-        pygame.draw.rect(self.surface, settings.BORDER_COLOR, text_rect.inflate(10, 10), 3)
+        pygame.draw.rect(exp_surface, settings.BORDER_COLOR, exp_surface.get_rect(), 3)
+        return exp_surface, frame_rect.topleft
 
-    def _weapon_box(self, left, top, switch):
-        """Draw a weapon box"""
-        # Get rectangle of box
-        box_rect = pygame.Rect(left, top, settings.BOX_SIZE, settings.BOX_SIZE)
-        # Draw the background
-        pygame.draw.rect(self.surface, settings.BG_COLOR, box_rect)
+    def _weapon_box(self, switch):
+        """Draw a weapon box, return it"""
+        # Create the box with its background
+        box_surface = pygame.Surface((settings.BOX_SIZE, settings.BOX_SIZE))
+        box_rect = box_surface.get_rect()
+        pygame.draw.rect(box_surface, settings.BG_COLOR, box_rect)
 
         # Draw the frame with color based off if the player is currently changing weapon
         # If the player has switched weapon, draw it in active color
         if switch:
-            pygame.draw.rect(self.surface, settings.BORDER_ACTIVE_COLOR, box_rect, 3)
+            pygame.draw.rect(box_surface, settings.BORDER_ACTIVE_COLOR, box_rect, 3)
         # Otherwise, draw it in the normal color
         else:
-            pygame.draw.rect(self.surface, settings.BORDER_COLOR, box_rect, 3)
+            pygame.draw.rect(box_surface, settings.BORDER_COLOR, box_rect, 3)
 
-        # Return the box's rectangle
-        return box_rect
+        # Return the box
+        return box_surface
 
     def _weapon_overlay(self, weapon_index, switch):
-        """Display proper weapon in the box"""
-        # Show the melee weapon box and get its rectangle
-        box_rect = self._weapon_box(10, 630, switch)
+        """Render proper weapon in the box, return it with its position"""
+        # Draw the melee weapon box
+        box_surface = self._weapon_box(switch)
 
         # Get the weapon's surface from a list based off current weapon index
         weapon_surface = self.weapon_graphics[weapon_index]
         # Place it at the center of the weapon box
-        weapon_rect = weapon_surface.get_rect(center=box_rect.center)
+        weapon_rect = weapon_surface.get_rect(center=box_surface.get_rect().center)
 
-        # Blit the weapon onto the main surface
-        self.surface.blit(weapon_surface, weapon_rect)
+        # Blit the weapon onto the box
+        box_surface.blit(weapon_surface, weapon_rect)
+        return box_surface, (10, 630)
 
     def _magic_overlay(self, magic_index, switch):
-        """Display the correct magic in magic's box"""
-        # Draw the magic's box rectangle and save it
-        box_rect = self._weapon_box(80, 635, not switch)
+        """Render the correct magic in magic's box, return it with its position"""
+        # Draw the magic's box
+        box_surface = self._weapon_box(not switch)
 
         # Get magic's surface based off current magic index
         magic_surface = self.magic_graphics[magic_index]
         # Center it in a weapon magic box
-        magic_rect = magic_surface.get_rect(center=box_rect.center)
+        magic_rect = magic_surface.get_rect(center=box_surface.get_rect().center)
 
         # Blit the spell
-        self.surface.blit(magic_surface, magic_rect)
+        box_surface.blit(magic_surface, magic_rect)
+        return box_surface, (80, 635)
 
     def _convert_weapon_dict(self):
         """Convert weapons from dictionary to a list"""
         # Go through each weapon
         for weapon in settings.weapon_info.values():
-            # Grab its image path and load it
-            path = weapon["graphic"]
-            weapon = pygame.image.load(os.path.join(settings.BASE_PATH, path)).convert_alpha()
+            # Grab its image path and get the image
+            weapon = assets.image(weapon["graphic"])
             # Add it to the list
             self.weapon_graphics.append(weapon)
 
@@ -134,8 +174,7 @@ class UI:
         """Convert magic spells into a list of loaded images"""
         # Iterate through each of magic's spells
         for magic in settings.magic_info.values():
-            # Save and load its image
-            path = magic["graphic"]
-            magic = pygame.image.load(os.path.join(settings.BASE_PATH, path)).convert_alpha()
+            # Get its image
+            magic = assets.image(magic["graphic"])
             # Append it
             self.magic_graphics.append(magic)
@@ -1,17 +1,22 @@
 import pygame
 
 from settings import settings
+from glyphs import text_renderer
 
 
 class UpgradeMenu:
     """Upgrade menu class"""
-    def __init__(self, player):
+    def __init__(self, player, clock, get_keys):
         """Initialize the upgrade menu"""
         # Get main surface
         self.surface = pygame.display.get_surface()
         # Get the player
         self.player = player
 
+        # Clock of the level and function returning state of the keyboard
+        self.clock = clock
+        self.get_keys = get_keys
+
         # Number of attributes
         self.attribute_number = len(player.stats)
         # Names of attributes
@@ -20,9 +25,6 @@ class UpgradeMenu:
         # Max statistics values
         self.max_values = list(player.max_stats.values())
 
-        # Font
-        self.font = pygame.font.Font(settings.FONT, settings.FONT_SIZE)
-
         # Dimensions of the items
         self.height = self.surface.get_height() * 0.7
         self.width = self.surface.get_width() // 6
@@ -30,6 +32,12 @@ class UpgradeMenu:
         # Create the menu items
         self._create_items()
 
+        # Frozen world and HUD under the menu, composited once it opens
+        self.background = None
+        # Background with the menu items drawn over it, and what each item was drawn with
+        self.frame = None
+        self.item_states = []
+
         # Current selected attribute index
         self.select_index = 0
         # Timer for selection
@@ -37,26 +45,47 @@ class UpgradeMenu:
         # Flag to be able to select attributes
         self.can_select = True
 
-    def display(self):
-        """Display the upgrade menu"""
+    def open(self, background):
+        """Open the menu over the frozen world and HUD"""
+        self.background = background
+        self.frame = background.copy()
+        # Draw every item onto the new background
+        self.item_states = [None] * self.attribute_number
+
+    def close(self):
+        """Close the menu, drop the cached background"""
+        self.background = None
+        self.frame = None
+
+    def display(self, draw=True):
+        """Display the upgrade menu, optionally only handling the input"""
         # Handle input
         self._handle_input()
         # Handle cooldown
         self._select_cooldown()
 
-        # Draw the menu items
+        if not draw or self.frame is None:
+            return
+
+        # Draw only the menu items that changed
         for index, item in enumerate(self.item_list):
             name = self.attribute_names[index]
             value = self.player.get_value(index)
             max_value = self.max_values[index]
             cost = self.player.get_cost(index)
 
-            item.display(self.surface, self.select_index, name, value, max_value, cost)
+            state = (index == self.select_index, name, value, max_value, cost)
+            if state != self.item_states[index]:
+                item.display(self.frame, self.select_index, name, value, max_value, cost)
+                self.item_states[index] = state
+
+        # Show the menu with everything under it at once
+        self.surface.blit(self.frame, (0, 0))
 
     def _handle_input(self):
         """Handle the input"""
         # Get the keys pressed
-        keys = pygame.key.get_pressed()
+        keys = self.get_keys()
 
         # Check if player can select any of the options
         if self.can_select:
@@ -65,7 +94,7 @@ class UpgradeMenu:
                 # Increase the selection index
                 self.select_index += 1
                 # Get select time
-                self.select_time = pygame.time.get_ticks()
+                self.select_time = self.clock.get_ticks()
                 # Stop the player from selecting too fast
                 self.can_select = False
 
@@ -73,20 +102,22 @@ class UpgradeMenu:
             elif keys[pygame.K_LEFT] or keys[pygame.K_a] and self.select_index >= 1:
                 # Decrease the selection index
                 self.select_index -= 1
-                self.select_time = pygame.time.get_ticks()
+                self.select_time = self.clock.get_ticks()
                 self.can_select = False
 
             # Accept the selection
             if keys[pygame.K_SPACE]:
-                self.select_time = pygame.time.get_ticks()
+                self.select_time = self.clock.get_ticks()
                 self.can_select = False
                 # Trigger item, try to upgrade statistics of the player
                 self.item_list[self.select_index].trigger(self.player)
+                # Player's statistics could change, so the HUD under the menu has to be drawn again
+                self.close()
 
     def _select_cooldown(self):
         """Handle the cooldown of attribute selection"""
         if not self.can_select:
-            current_time = pygame.time.get_ticks()
+            current_time = self.clock.get_ticks()
             if current_time - self.select_time >= 400:
                 self.can_select = True
 
@@ -103,21 +134,19 @@ class UpgradeMenu:
             left = (item_num * increment) + (increment - self.width) // 2
 
             # Create the menu item
-            item = Item(left, top, self.width, self.height, item_index, self.font)
+            item = Item(left, top, self.width, self.height, item_index)
             # Add it to the item list
             self.item_list.append(item)
 
 
 class Item:
     """Singular menu item"""
-    def __init__(self, left, top, width, height, index, font):
+    def __init__(self, left, top, width, height, index):
         """Initialize the menu item"""
         # Create the item's rectangle
         self.rect = pygame.Rect(left, top, width, height)
         # Store its index
         self.index = index
-        # Save the font
-        self.font = font
 
     def display(self, surface, selection_number, name, value, max_value, cost):
         """Display the item with certain information"""
@@ -144,11 +173,11 @@ class Item:
         text_color = settings.TEXT_SELECT_COLOR if select else settings.TEXT_COLOR
 
         # Get statistic title text image and rectangle
-        title_surface = self.font.render(name, False, text_color)
+        title_surface = text_renderer.render(name, text_color)
         title_rect = title_surface.get_rect(midtop=self.rect.midtop + pygame.math.Vector2(0, 20))
 
         # Get its cost and cost's rect
-        cost_surface = self.font.render(f"{int(cost)}", False, text_color)
+        cost_surface = text_renderer.render(f"{int(cost)}", text_color)
         cost_rect = cost_surface.get_rect(midbottom=self.rect.midbottom - pygame.math.Vector2(0, 20))
 
         # Draw the text
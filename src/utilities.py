@@ -1,9 +1,8 @@
 from csv import reader
 import os
 
-import pygame
-
 from settings import settings
+from assets import assets
 
 
 class Utilities:
@@ -26,22 +25,10 @@ class Utilities:
             # Return the terrain list
             return terrain
 
-    def import_folder(self, path):
-        """Import files from a given directory path"""
-        surfaces = []
-        # Make the path absolute
-        path = str(os.path.join(settings.BASE_PATH, path))
-
-        # Go through each file that exists there
-        for dir_path, dirs, images in os.walk(path):
-            # Go through each of the images
-            for image in images:
-                # Save the full path to the image
-                full_path = path + '/' + image
-                # Load it
-                image_surface = pygame.image.load(full_path).convert_alpha()
-                surfaces.append(image_surface)
-        return surfaces
+    def import_folder(self, path, scale=1, flip=False):
+        """Import files from a given directory path, optionally scaled and flipped"""
+        # Get the images shared through the asset cache
+        return assets.folder(path, scale, flip)
 
 
 utilities = Utilities()
\ No newline at end of file
@@ -1,8 +1,6 @@
-import os
-
 import pygame
 
-from settings import settings
+from assets import assets
 
 
 class Weapon(pygame.sprite.Sprite):
@@ -16,10 +14,8 @@ class Weapon(pygame.sprite.Sprite):
         # Set sprite type
         self.sprite_type = "weapon"
 
-        # Create weapon image and load it
-        image_path = os.path.join(settings.BASE_PATH,
-                                  f"../graphics/weapons/{player.weapon}/{self.direction}.png")
-        self.image = pygame.image.load(image_path).convert_alpha()
+        # Get the weapon image
+        self.image = assets.image(f"../graphics/weapons/{player.weapon}/{self.direction}.png")
 
         # Set placement of the weapon
         self._set_placement(player)
@@ -0,0 +1,315 @@
+from collections import OrderedDict
+from heapq import merge
+from random import Random
+
+import numpy
+import pygame
+
+from settings import settings
+from tile import TileTable
+from collision import CollisionGrid
+from prefetch import prefetcher
+from tracing import tracer
+
+
+class WorldChunk:
+    """Static tiles of one square part of the map, with their collision grid and spawns of the enemies"""
+    def __init__(self, key, tiles, grid, baked, spawns):
+        """Initialize the chunk"""
+        # Position of the chunk, in chunks
+        self.key = key
+        # Static tiles and the grid of their hitboxes
+        self.tiles = tiles
+        self.grid = grid
+        # Indexes of the objects baked into the floor
+        self.baked = baked
+        # Enemies placed in the chunk, as (name, (pos_x, pos_y)) pairs
+        self.spawns = spawns
+
+    def kill(self, index):
+        """Destroy the tile, clear it from the collision grid"""
+        self.grid.remove(index)
+        self.tiles.kill(index)
+
+    def restore(self, cut):
+        """Bring back the grass, then destroy the grass tiles that were cut"""
+        for index in self.tiles.revive("grass").tolist():
+            self.grid.add(index)
+        for index in cut:
+            self.kill(index)
+
+
+class World:
+    """Map split into chunks, the ones around the player are active, others are built in the background or forgotten"""
+    # Names of the enemies by their tile IDs, any other ID is a squid
+    ENEMY_NAMES = {390: "bamboo", 391: "spirit", 392: "raccoon"}
+    # Tile ID of the player's spawn
+    PLAYER_ID = 394
+
+    def __init__(self, compiled_map, graphics, floor, seed, counter, create_enemy):
+        """Initialize the world, with tiles numbered from the counter and enemies created by the callback"""
+        self.compiled_map = compiled_map
+        self.graphics = graphics
+        # Floor the objects that can't be walked around are baked into
+        self.floor = floor
+        # Seed of the random images of the grass
+        self.seed = seed
+        self.counter = counter
+        self.create_enemy = create_enemy
+
+        # Size of a chunk in pixels, number of chunks in each direction
+        self.span = settings.WORLD_CHUNK_SIZE * settings.SIZE
+        self.columns = -(-compiled_map.columns // settings.WORLD_CHUNK_SIZE)
+        self.rows = -(-compiled_map.rows // settings.WORLD_CHUNK_SIZE)
+
+        # Player's spawn position
+        self.player_spawn = None
+        rows, columns, tile_ids = compiled_map.tiles("entities")
+        for row, column, tile_id in zip(rows.tolist(), columns.tolist(), tile_ids.tolist()):
+            if tile_id == self.PLAYER_ID:
+                self.player_spawn = (column * settings.SIZE, row * settings.SIZE)
+
+        # Chunks around the player, the ones built in the background, and built ones kept for later, oldest first
+        self.active = {}
+        self.loading = {}
+        self.ready = OrderedDict()
+
+        # State saved when chunks are left: indexes of the cut grass, and enemies as (name, position, health)
+        self.cut_grass = {}
+        self.enemy_states = {}
+        # Chunks whose enemies were spawned already
+        self.visited = set()
+        # Enemies created by the world
+        self.enemies = {}
+
+    def __len__(self):
+        """Get number of the tiles in the active chunks"""
+        return sum(len(chunk.tiles) for chunk in self.active.values())
+
+    @property
+    def count(self):
+        """Number of the drawn tiles that are alive, in the active chunks"""
+        return sum(chunk.tiles.count for chunk in self.active.values())
+
+    @tracer.traced("World.update")
+    def update(self, pos, direction):
+        """Activate chunks around the position, prefetch the ones in the direction, deactivate the far ones"""
+        center_x, center_y = self.chunk_key(*pos)
+        radius = settings.WORLD_ACTIVE_RADIUS
+        required = [(column, row)
+                    for row in range(center_y - radius, center_y + radius + 1)
+                    for column in range(center_x - radius, center_x + radius + 1)
+                    if 0 <= column < self.columns and 0 <= row < self.rows]
+
+        # Chunks the player is heading to are built in the background
+        step_x, step_y = int(numpy.sign(direction[0])), int(numpy.sign(direction[1]))
+        if step_x or step_y:
+            for column, row in required:
+                self._prefetch((column + step_x, row + step_y))
+
+        # Activate chunks that came into range
+        for key in required:
+            if key not in self.active:
+                self._activate(key)
+
+        # Deactivate the ones left behind, a bit further away so walking along an edge doesn't swap them
+        for key in [key for key in self.active
+                    if max(abs(key[0] - center_x), abs(key[1] - center_y)) > radius + 1]:
+            self._deactivate(key)
+
+        # Keep the chunks that were built meanwhile
+        for key in [key for key, future in self.loading.items() if future.done()]:
+            self._keep(key, self.loading.pop(key).result())
+
+        self._sweep_enemies()
+
+    def reset(self):
+        """Forget every change of the world, deactivating the chunks"""
+        for key in list(self.active):
+            self._deactivate(key)
+        self.cut_grass = {}
+        self.enemy_states = {}
+        self.visited = set()
+        self.enemies = {}
+
+    def chunk_key(self, pos_x, pos_y):
+        """Get key of the chunk at the position in pixels"""
+        return int(pos_x // self.span), int(pos_y // self.span)
+
+    def nearby(self, rect):
+        """Get static hitboxes around the rectangle, from the active chunks"""
+        # Chunks whose grids reach the rectangle, they're padded by one tile, called for every move so done inline
+        span, size = self.span, settings.SIZE
+        left, right = (rect.left - size) // span, (rect.right + size - 1) // span
+        top, bottom = (rect.top - size) // span, (rect.bottom + size - 1) // span
+        # Most of the time the rectangle is inside a single chunk
+        if left == right and top == bottom:
+            chunk = self.active.get((left, top))
+            return chunk.grid.nearby(rect) if chunk is not None else []
+
+        hitboxes = []
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                chunk = self.active.get((column, row))
+                if chunk is not None:
+                    hitboxes += chunk.grid.nearby(rect)
+        return hitboxes
+
+    def visible(self, view_rect, offset_x, offset_y):
+        """Get drawn tiles overlapping the view, as sorted lists of ((centery, sequence), (image, position)) pairs"""
+        return [self.active[key].tiles.visible(view_rect, offset_x, offset_y)
+                for key in self._chunk_keys(view_rect.inflate(settings.SIZE * 2, settings.SIZE * 2))
+                if key in self.active]
+
+    def query_rect(self, rect, sprite_type):
+        """Get (chunk, index) pairs of the living tiles of the type colliding with the rectangle, in drawing order"""
+        tiles = []
+        for key in self._chunk_keys(rect.inflate(settings.SIZE * 2, settings.SIZE * 2)):
+            chunk = self.active.get(key)
+            if chunk is not None:
+                sequences = chunk.tiles.arrays["sequence"]
+                tiles.append([(int(sequences[index]), chunk, index)
+                              for index in chunk.tiles.query_rect(rect, sprite_type)])
+        return [(chunk, index) for sequence, chunk, index in merge(*tiles, key=lambda item: item[0])]
+
+    def is_free(self, column, row):
+        """Check if nothing static blocks the tile of the map, only tiles of the active chunks can be free"""
+        chunk = self.active.get((column // settings.WORLD_CHUNK_SIZE, row // settings.WORLD_CHUNK_SIZE))
+        if chunk is None:
+            return False
+        # The grid is padded by one tile around the chunk
+        grid = chunk.grid
+        return not grid.occupancy[row - grid.origin_y // settings.SIZE, column - grid.origin_x // settings.SIZE]
+
+    def _chunk_keys(self, rect):
+        """Get keys of the chunks the rectangle overlaps"""
+        left, top = self.chunk_key(rect.left, rect.top)
+        right, bottom = self.chunk_key(rect.right - 1, rect.bottom - 1)
+        return [(column, row) for row in range(max(top, 0), min(bottom, self.rows - 1) + 1)
+                for column in range(max(left, 0), min(right, self.columns - 1) + 1)]
+
+    def _prefetch(self, key):
+        """Start building the chunk in the background, unless it's there already"""
+        if not (0 <= key[0] < self.columns and 0 <= key[1] < self.rows):
+            return
+        if key not in self.active and key not in self.ready and key not in self.loading:
+            self.loading[key] = prefetcher.run(self._build, key)
+
+    def _keep(self, key, chunk):
+        """Keep the built chunk for later, forget the oldest ones over the limit"""
+        self.ready[key] = chunk
+        self.ready.move_to_end(key)
+        while len(self.ready) > settings.WORLD_CACHED_CHUNKS:
+            self.ready.popitem(last=False)
+
+    def _activate(self, key):
+        """Put the chunk into the world, with its saved state, wait for it if it's still being built"""
+        chunk = self.ready.pop(key, None)
+        if chunk is None:
+            # Chunks that weren't prefetched are built right away, the background threads would only share the time
+            future = self.loading.pop(key, None)
+            chunk = future.result() if future is not None else self._build(key)
+        self.active[key] = chunk
+
+        # Cut grass stays cut, the tiles are drawn after everything created so far
+        chunk.restore(self.cut_grass.get(key, []))
+        chunk.tiles.number(self.counter)
+        for index in chunk.baked.tolist():
+            self.floor.add_object(chunk.tiles.image(index), chunk.tiles.rect(index))
+
+        # Spawn enemies placed in the chunk the first time, along with the ones that were left there
+        states = self.enemy_states.pop(key, [])
+        if key not in self.visited:
+            self.visited.add(key)
+            states = [(name, pos, None) for name, pos in chunk.spawns] + states
+        for name, pos, health in states:
+            enemy = self.create_enemy(name, *pos)
+            if health is not None:
+                enemy.health = health
+            self.enemies[enemy] = None
+
+    def _deactivate(self, key):
+        """Take the chunk out of the world, saving its cut grass"""
+        chunk = self.active.pop(key)
+        self.cut_grass[key] = chunk.tiles.dead_indexes("grass").tolist()
+        self._keep(key, chunk)
+
+    def _sweep_enemies(self):
+        """Forget dead enemies, save and remove the ones that walked out of the active chunks"""
+        for enemy in list(self.enemies):
+            if not enemy.alive():
+                del self.enemies[enemy]
+                continue
+
+            key = self.chunk_key(*enemy.rect.center)
+            if key not in self.active:
+                self.enemy_states.setdefault(key, []).append((enemy.name, enemy.rect.topleft, enemy.health))
+                del self.enemies[enemy]
+                enemy.kill()
+
+    def _build(self, key):
+        """Create tiles of the chunk and rasterize their hitboxes, on a background thread"""
+        with tracer.span("build chunk", key=key):
+            size = settings.WORLD_CHUNK_SIZE
+            first_column, first_row = key[0] * size, key[1] * size
+            layers = self.compiled_map.layers
+            tiles = TileTable()
+
+            # Invisible limits of the map
+            columns, rows, tile_ids = self._layer_tiles(layers["limit"], first_column, first_row)
+            tiles.add("invisible", columns * settings.SIZE, rows * settings.SIZE)
+
+            # Objects, the ones nothing can ever walk around are baked into the floor, keeping only their hitboxes
+            columns, rows, tile_ids = self._layer_tiles(layers["object"], first_column, first_row)
+            images = [self.graphics["objects"][tile_id] for tile_id in tile_ids.tolist()]
+            baked = numpy.array([self._is_enclosed(pos_x, pos_y, image)
+                                 for pos_x, pos_y, image in zip((columns * settings.SIZE).tolist(),
+                                                                (rows * settings.SIZE).tolist(), images)], dtype=bool)
+            indexes = tiles.add("object", columns * settings.SIZE, rows * settings.SIZE, images, ~baked)
+
+            # Grass, with a random image for each tile, the same every time the chunk is built
+            rng = Random(f"{self.seed} {key[0]} {key[1]}")
+            columns, rows, tile_ids = self._layer_tiles(layers["grass"], first_column, first_row)
+            images = [rng.choice(self.graphics["grass"]) for index in range(len(tile_ids))]
+            tiles.add("grass", columns * settings.SIZE, rows * settings.SIZE, images)
+
+            # Rasterize the hitboxes once, on a grid one tile bigger on each side for the ones reaching out
+            grid = CollisionGrid(size + 2, size + 2,
+                                 origin=((first_column - 1) * settings.SIZE, (first_row - 1) * settings.SIZE))
+            grid.rasterize(tiles.hitboxes())
+
+            # Enemies placed in the chunk
+            columns, rows, tile_ids = self._layer_tiles(layers["entities"], first_column, first_row)
+            spawns = [(self.ENEMY_NAMES.get(tile_id, "squid"), (column * settings.SIZE, row * settings.SIZE))
+                      for column, row, tile_id in zip(columns.tolist(), rows.tolist(), tile_ids.tolist())
+                      if tile_id != self.PLAYER_ID]
+
+            return WorldChunk(key, tiles, grid, indexes[baked], spawns)
+
+    def _layer_tiles(self, layout, first_column, first_row):
+        """Get columns, rows and IDs of non-empty tiles of the layer within the chunk, in row order"""
+        size = settings.WORLD_CHUNK_SIZE
+        area = layout[first_row:first_row + size, first_column:first_column + size]
+        rows, columns = numpy.nonzero(area != -1)
+        return columns + first_column, rows + first_row, area[rows, columns]
+
+    def _is_enclosed(self, pos_x, pos_y, image):
+        """Check if every tile around the object is blocked, so no sprite can be drawn over it"""
+        if not settings.BAKE_OBJECTS:
+            return False
+        limit_layout = self.compiled_map.layers["limit"]
+
+        # Area of the object (placed the same way as object tiles), widened by the margin
+        margin = settings.BAKE_OBJECT_MARGIN
+        area = pygame.Rect((pos_x, pos_y - settings.SIZE), image.get_size()).inflate(margin * 2, margin * 2)
+
+        # Go through each tile in the area
+        for row in range(area.top // settings.SIZE, (area.bottom - 1) // settings.SIZE + 1):
+            for column in range(area.left // settings.SIZE, (area.right - 1) // settings.SIZE + 1):
+                # Tiles outside the map can't be reached
+                if not (0 <= row < limit_layout.shape[0] and 0 <= column < limit_layout.shape[1]):
+                    continue
+                # If any of the tiles isn't a limit, something can walk there
+                if limit_layout[row, column] == -1:
+                    return False
+        return True
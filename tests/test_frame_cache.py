@@ -0,0 +1,69 @@
+import gc
+from itertools import count
+import random
+import weakref
+
+import pygame
+import pytest
+
+from assets import assets
+from atlas import texture_atlas
+from particles import Animation, ParticleSystem
+
+
+@pytest.fixture
+def atlas(tmp_path, monkeypatch):
+    """Texture atlas built into a temporary folder"""
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    monkeypatch.setattr(texture_atlas, "path", str(tmp_path))
+    monkeypatch.setattr(texture_atlas, "index_path", str(tmp_path / "index.json"))
+    texture_atlas.build()
+    yield texture_atlas
+
+    # Forget everything loaded from the temporary atlas
+    texture_atlas.frames = texture_atlas.folders = None
+    texture_atlas.sheets = {}
+    texture_atlas.users = {}
+    texture_atlas.bytes = 0
+    assets.__init__()
+    pygame.quit()
+
+
+def test_evicted_sets_free_their_sheets(atlas):
+    animation = Animation(random.Random(0), ParticleSystem(count()))
+    cache = animation.frames
+    # Budget of about one and a half sheets, so loading every set evicts most of them
+    cache.budget = 6 * 1024 * 1024
+
+    sheet_bytes = set()
+    for name in animation.FRAME_SETS:
+        cache.get(name)
+        sheet_bytes.add(atlas.bytes)
+
+        # Memory taken by the sheets and the copied frames stays within what the cache charged
+        assert atlas.bytes + assets.bytes <= cache.bytes
+        assert cache.bytes <= cache.budget or len(cache.sets) == 1
+    # Sheets actually got dropped along the way
+    assert len(atlas.sheets) < 4
+    assert min(sheet_bytes) < max(sheet_bytes)
+
+
+def test_sheet_is_freed_once_its_last_set_is_evicted(atlas):
+    animation = Animation(random.Random(0), ParticleSystem(count()))
+    cache = animation.frames
+    cache.budget = 6 * 1024 * 1024
+
+    # No other loaded set uses the sheet of leaf 1
+    sheet = weakref.ref(cache.get("leaf1")[0].get_parent())
+    assert sheet() is not None
+
+    # Loading sets from the other sheets goes over the budget and evicts it
+    cache.get("leaf3")
+    cache.get("leaf6")
+    gc.collect()
+
+    assert "leaf1" not in cache
+    assert sheet() is None
+    assert atlas.bytes <= cache.bytes <= cache.budget